@@ -0,0 +1,68 @@
+import logging
+import azure.functions as func
+import os
+import json
+from azure.data.tables import TableServiceClient, UpdateMode
+
+# Maximum operations Azure Table Storage accepts in one transaction (all grants share a partition)
+TRANSACTION_BATCH_SIZE = 100
+
+def upsert_entities(table_client, entities):
+    """Upsert a batch of entities in one transaction, falling back to one call per entity.
+    Returns the number of entities written."""
+    try:
+        table_client.submit_transaction([("upsert", entity, {"mode": UpdateMode.MERGE}) for entity in entities])
+        return len(entities)
+    except Exception as e:
+        logging.warning(f"Batch upsert of {len(entities)} grants failed, retrying individually: {str(e)}")
+    
+    written = 0
+    for entity in entities:
+        try:
+            table_client.upsert_entity(entity, mode=UpdateMode.MERGE)
+            written += 1
+        except Exception as e:
+            logging.error(f"Error storing grant {entity.get('RowKey')}: {str(e)}")
+    return written
+
+def parse_entities(content, source):
+    """Yield the entity on each line of an NDJSON document, skipping blank and malformed lines"""
+    for line_number, line in enumerate(content.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            logging.error(f"Skipping malformed line {line_number} in {source}: {str(e)}")
+
+def main(blob: func.InputStream) -> None:
+    """Load an NDJSON file written by the collector's --bulk mode into the GrantDetails table"""
+    logging.info(f'ImportGrants function triggered for blob: {blob.name}')
+    
+    try:
+        connection_string = os.environ.get("AzureWebJobsStorage")
+        table_service = TableServiceClient.from_connection_string(connection_string)
+        table_client = table_service.get_table_client("GrantDetails")
+        
+        # The trigger hands over the whole blob in memory; InputStream only supports read()
+        content = blob.read().decode("utf-8")
+        
+        total = 0
+        written = 0
+        batch = []
+        for entity in parse_entities(content, blob.name):
+            total += 1
+            batch.append(entity)
+            if len(batch) == TRANSACTION_BATCH_SIZE:
+                written += upsert_entities(table_client, batch)
+                batch = []
+        
+        if batch:
+            written += upsert_entities(table_client, batch)
+        
+        logging.info(f"Imported {written} of {total} grants from {blob.name}")
+        
+    except Exception as e:
+        logging.error(f"Error in ImportGrants function: {str(e)}")
+        # Let the runtime retry the blob; upserts make a partial re-import harmless
+        raise
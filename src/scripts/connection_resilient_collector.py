@@ -7,26 +7,43 @@ import re
 import logging
 import subprocess
 import sys
+import queue
+import atexit
+import shelve
+import sqlite3
+import itertools
+import threading
 from datetime import datetime, timedelta
+from types import MappingProxyType
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from azure.data.tables import TableServiceClient, UpdateMode
 import traceback
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from rate_limit import TokenBucket
 from tqdm import tqdm
 
-# Set up logging
+# Set up logging - callers format and enqueue records; a listener thread does the file/console I/O
+log_queue = queue.Queue(-1)
+log_listener = QueueListener(
+    log_queue,
+    RotatingFileHandler("grant_collection.log", maxBytes=50_000_000, backupCount=3),
+    logging.StreamHandler(sys.stdout)
+)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(f"grant_collection_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=[QueueHandler(log_queue)]
 )
 logger = logging.getLogger(__name__)
 
-# All field mappings from grants.gov to our Azure table
-FIELD_MAPPINGS = {
+# All field mappings from grants.gov to our Azure table (read-only)
+FIELD_MAPPINGS = MappingProxyType({
     "Document Type": "DocType",
     "Funding Opportunity Number": "Number",
     "Funding Opportunity Title": "Title",
@@ -53,7 +70,59 @@ FIELD_MAPPINGS = {
     "Description": "Description",
     "Link to Additional Information": "AdditionalInfoLink",
     "Grantor Contact Information": "GrantorContact"
-}
+})
+
+# One alternation over every label so the fallback extraction walks the DOM once.
+# Longest labels go first so "Opportunity Category Explanation" wins over "Opportunity Category".
+FIELD_LABEL_RE = re.compile('|'.join(re.escape(label) for label in sorted(FIELD_MAPPINGS, key=len, reverse=True)))
+
+# Characters stripped before numeric conversion
+NON_INT_RE = re.compile(r'[^0-9\-]')
+NON_FLOAT_RE = re.compile(r'[^0-9\.\-]')
+
+# Date formats seen on grants.gov pages
+DATE_FORMATS = (
+    '%b %d, %Y',  # "Apr 13, 2023"
+    '%B %d, %Y',  # "April 13, 2023"
+    '%m/%d/%Y',   # "04/13/2023"
+    '%Y-%m-%d',   # "2023-04-13"
+)
+
+# CSS selector groups for the page sections we scrape; select_one walks the tree once per group
+GENERAL_INFO_SELECTOR = 'div.synopsis-section, div.section, div[data-testid="general-info"]'
+TITLE_SELECTOR = '.title, .grant-title, .opportunity-title'
+DESCRIPTION_SELECTOR = ('div#description-id, div.description, div[data-testid="description"], '
+                        'div.synopsis-detail, div.opportunity-description')
+ELIGIBILITY_SELECTOR = 'div#eligibility-id, div.eligibility, div[data-testid="eligibility"]'
+
+# Shared by every request to grants.gov (requests per second)
+REQUEST_BUCKET = TokenBucket(rate=20)
+
+# Pooled HTTP session; transient failures (throttling, 5xx) are retried with exponential backoff
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True
+    )
+))
+
+# Local staging store: scraped grants land here first and are uploaded to Azure afterwards,
+# so work scraped before a crash or interrupt is not lost. Rows are removed once uploaded
+STAGING_DB = "grant_staging.db"
+staging_lock = threading.Lock()
+
+# Status codes meaning the grant has been permanently removed from grants.gov
+GONE_STATUS_CODES = (404, 410)
+
+# Scraped grants kept between runs, keyed by opportunity ID, so unchanged pages can be
+# revalidated with a conditional GET instead of downloaded and parsed again
+PAGE_CACHE_FILE = "grant_page_cache"
+page_cache_lock = threading.Lock()
 
 def ensure_azure_connection():
     """Make sure we're connected to Azure, attempt to login if needed"""
@@ -126,7 +195,10 @@ def safe_int(value, default=0):
     try:
         # Remove any non-numeric characters except negative sign
         if isinstance(value, str):
-            value = re.sub(r'[^0-9\-]', '', value)
+            # Plain digit strings (the common case) need no cleanup
+            if value.isascii() and value.isdigit():
+                return int(value)
+            value = NON_INT_RE.sub('', value)
             if value == '' or value == '-':
                 return default
         return int(float(value))
@@ -140,9 +212,12 @@ def safe_float(value, default=0.0):
     try:
         # Remove any non-numeric characters except decimal point and negative sign
         if isinstance(value, str):
+            # Plain digit strings (the common case) need no cleanup
+            if value.isascii() and value.isdigit():
+                return float(value)
             # Handle dollar sign and commas
             value = value.replace('$', '').replace(',', '')
-            value = re.sub(r'[^0-9\.\-]', '', value)
+            value = NON_FLOAT_RE.sub('', value)
             if value == '' or value == '.' or value == '-' or value == '-.':
                 return default
         return float(value)
@@ -155,16 +230,10 @@ def format_date(date_str):
         return ""
     
     # Try to identify the date format
-    date_formats = [
-        '%b %d, %Y',  # "Apr 13, 2023"
-        '%B %d, %Y',  # "April 13, 2023"
-        '%m/%d/%Y',   # "04/13/2023"
-        '%Y-%m-%d',   # "2023-04-13"
-    ]
-    
-    for fmt in date_formats:
+    stripped = date_str.strip()
+    for fmt in DATE_FORMATS:
         try:
-            dt = datetime.strptime(date_str.strip(), fmt)
+            dt = datetime.strptime(stripped, fmt)
             return dt.strftime('%Y-%m-%d')
         except ValueError:
             continue
@@ -210,13 +279,14 @@ def get_grant_ids(strategy="recent", limit=1000):
         }
     
     try:
-        # Add delay to avoid rate limiting
-        time.sleep(0.5)
+        # Wait for a slot in the shared rate limit
+        REQUEST_BUCKET.acquire()
         
-        response = requests.post(search_url, headers=headers, json=payload, timeout=30)
+        response = SESSION.post(search_url, headers=headers, json=payload, timeout=30)
         
         if response.status_code == 200:
-            data = response.json()
+            # Parse the raw bytes directly (skips requests' text decoding step)
+            data = json.loads(response.content)
             
             # Check for error code
             if data.get("errorcode", 0) != 0:
@@ -239,6 +309,32 @@ def get_grant_ids(strategy="recent", limit=1000):
     
     return grant_ids
 
+def get_cached_page(opportunity_id):
+    """Return the cached validators and grant data for a grant, if any"""
+    try:
+        with page_cache_lock, shelve.open(PAGE_CACHE_FILE) as cache:
+            return cache.get(opportunity_id)
+    except Exception as e:
+        logger.debug(f"Could not read page cache for grant {opportunity_id}: {str(e)}")
+        return None
+
+def save_cached_page(opportunity_id, response, grant_data):
+    """Remember the response validators and scraped data for a grant"""
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return
+    
+    try:
+        with page_cache_lock, shelve.open(PAGE_CACHE_FILE) as cache:
+            cache[opportunity_id] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "grant_data": grant_data
+            }
+    except Exception as e:
+        logger.debug(f"Could not write page cache for grant {opportunity_id}: {str(e)}")
+
 def scrape_grant_details(opportunity_id):
     """Scrape complete grant details from grants.gov website"""
     logger.debug(f"Scraping grant {opportunity_id} from Grants.gov website")
@@ -246,8 +342,8 @@ def scrape_grant_details(opportunity_id):
     url = f"https://www.grants.gov/search-results-detail/{opportunity_id}"
     
     try:
-        # Add delay to avoid rate limiting
-        time.sleep(0.5)
+        # Wait for a slot in the shared rate limit
+        REQUEST_BUCKET.acquire()
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Safari/605.1.15',
@@ -256,16 +352,39 @@ def scrape_grant_details(opportunity_id):
             'Referer': 'https://www.grants.gov/',
             'Connection': 'keep-alive'
         }
-        response = requests.get(url, headers=headers, timeout=30)
+        
+        # Revalidate against the previous scrape instead of re-downloading
+        cached = get_cached_page(opportunity_id)
+        if cached:
+            if cached.get("etag"):
+                headers['If-None-Match'] = cached["etag"]
+            if cached.get("last_modified"):
+                headers['If-Modified-Since'] = cached["last_modified"]
+        
+        response = SESSION.get(url, headers=headers, timeout=30)
         
         # Debug output to see the response
         logger.debug(f"Response status: {response.status_code}")
+        if response.status_code == 304 and cached:
+            logger.debug(f"Grant {opportunity_id} unchanged since last scrape - using cached data")
+            return dict(cached["grant_data"])
+        
+        if response.status_code in GONE_STATUS_CODES:
+            # Record a tombstone so future runs skip this grant without fetching it again
+            logger.info(f"Grant {opportunity_id} no longer exists (HTTP {response.status_code}) - marking as gone")
+            return {
+                "PartitionKey": "Grant",
+                "RowKey": opportunity_id,
+                "Status": "Gone",
+                "LastUpdated": datetime.now().isoformat()
+            }
+        
         if response.status_code != 200:
             logger.warning(f"Failed to fetch grant {opportunity_id}: HTTP {response.status_code}")
             return None
         
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # Parse the HTML content with the C-backed lxml parser, straight from the raw bytes
+        soup = BeautifulSoup(response.content, 'lxml')
         
         # Save HTML for debugging if needed
         with open(f"grant_{opportunity_id}_debug.html", "w", encoding="utf-8") as f:
@@ -280,14 +399,14 @@ def scrape_grant_details(opportunity_id):
             "LastUpdated": datetime.now().isoformat()
         }
         
-        # Locate the general information section - try different selectors
-        general_info = None
-        for selector in ['div.synopsis-section', 'div.section', 'div[data-testid="general-info"]']:
-            general_info = soup.select_one(selector)
-            if general_info:
-                logger.debug(f"Found general info section using selector: {selector}")
-                break
-                
+        # Collect every table once; the lookups below reuse this list instead of re-walking the DOM
+        all_tables = soup.find_all('table')
+        
+        # Locate the general information section - one selector group, one tree walk
+        general_info = soup.select_one(GENERAL_INFO_SELECTOR)
+        if general_info:
+            logger.debug("Found general info section using selector")
+            
         if not general_info:
             # Try a more general approach - look for sections with tables
             sections = soup.find_all('div', class_=lambda c: c and ('section' in c.lower() or 'info' in c.lower()))
@@ -301,17 +420,16 @@ def scrape_grant_details(opportunity_id):
             logger.warning(f"Could not find general information section for grant {opportunity_id}")
             
             # Try a different approach - get all tables on the page
-            tables = soup.find_all('table')
-            if tables:
-                general_info = tables[0].parent
+            if all_tables:
+                general_info = all_tables[0].parent
                 logger.debug("Found general info by locating first table")
         
         # If we found the general info section, extract data from it
         if general_info:
-            # Look for tables
-            tables = general_info.find_all('table')
+            # Look for tables inside the section, falling back to every table on the page
+            tables = [table for table in all_tables if any(parent is general_info for parent in table.parents)]
             if not tables:
-                tables = soup.find_all('table')
+                tables = all_tables
                 
             for table in tables:
                 rows = table.find_all('tr')
@@ -324,56 +442,48 @@ def scrape_grant_details(opportunity_id):
                         value_text = value.get_text().strip()
                         
                         # Map the field to our Azure table column names
-                        if header_text in FIELD_MAPPINGS:
-                            azure_field = FIELD_MAPPINGS[header_text]
+                        azure_field = FIELD_MAPPINGS.get(header_text)
+                        if azure_field is not None:
                             grant_data[azure_field] = value_text
                             logger.debug(f"Found field: {header_text} = {value_text[:30]}...")
         
         # If we couldn't find tables, try another approach - look for labeled fields
         if len(grant_data) <= 5:  # If we only have the basic fields we started with
             logger.debug("Trying alternative extraction method for grant data")
-            # Look for all divs that might contain field labels and values
-            for field_label, azure_field in FIELD_MAPPINGS.items():
-                # Try to find elements containing these labels
-                label_elements = soup.find_all(string=lambda s: s and field_label in s)
-                for label in label_elements:
-                    # Try to get the value - it might be in the next sibling or parent's next sibling
-                    parent = label.parent
-                    if parent:
-                        # Try next sibling
-                        next_sibling = parent.next_sibling
-                        if next_sibling and hasattr(next_sibling, 'get_text'):
-                            value_text = next_sibling.get_text().strip()
-                            if value_text:
-                                grant_data[azure_field] = value_text
-                                continue
-                                
-                        # Try parent's next sibling
-                        parent_next = parent.parent.next_sibling if parent.parent else None
-                        if parent_next and hasattr(parent_next, 'get_text'):
-                            value_text = parent_next.get_text().strip()
-                            if value_text:
-                                grant_data[azure_field] = value_text
+            # Look for all text nodes containing any field label in a single pass
+            for label in soup.find_all(string=FIELD_LABEL_RE):
+                azure_field = FIELD_MAPPINGS[FIELD_LABEL_RE.search(label).group(0)]
+                
+                # Try to get the value - it might be in the next sibling or parent's next sibling
+                parent = label.parent
+                if parent:
+                    # Try next sibling
+                    next_sibling = parent.next_sibling
+                    if next_sibling and hasattr(next_sibling, 'get_text'):
+                        value_text = next_sibling.get_text().strip()
+                        if value_text:
+                            grant_data[azure_field] = value_text
+                            continue
+                            
+                    # Try parent's next sibling
+                    parent_next = parent.parent.next_sibling if parent.parent else None
+                    if parent_next and hasattr(parent_next, 'get_text'):
+                        value_text = parent_next.get_text().strip()
+                        if value_text:
+                            grant_data[azure_field] = value_text
         
         # Try to find the title
         title_element = soup.find('h1', class_=lambda c: c and 'title' in c.lower())
         if title_element:
             grant_data["Title"] = title_element.get_text().strip()
         else:
-            # Try different selectors for title
-            for selector in ['h1', '.title', '.grant-title', '.opportunity-title']:
-                elements = soup.select(selector)
-                if elements:
-                    grant_data["Title"] = elements[0].get_text().strip()
-                    break
+            # Any h1 takes precedence over the class-based title selectors
+            title_element = soup.select_one('h1') or soup.select_one(TITLE_SELECTOR)
+            if title_element:
+                grant_data["Title"] = title_element.get_text().strip()
         
         # Extract description (which is in a different section)
-        description_section = None
-        for selector in ['div#description-id', 'div.description', 'div[data-testid="description"]', 
-                        'div.synopsis-detail', 'div.opportunity-description']:
-            description_section = soup.select_one(selector)
-            if description_section:
-                break
+        description_section = soup.select_one(DESCRIPTION_SELECTOR)
                 
         if not description_section:
             # Try looking for headers with "Description" text
@@ -389,11 +499,7 @@ def scrape_grant_details(opportunity_id):
             grant_data["Description"] = description_text
             
         # Extract eligibility info
-        eligibility_section = None
-        for selector in ['div#eligibility-id', 'div.eligibility', 'div[data-testid="eligibility"]']:
-            eligibility_section = soup.select_one(selector)
-            if eligibility_section:
-                break
+        eligibility_section = soup.select_one(ELIGIBILITY_SELECTOR)
                 
         if not eligibility_section:
             # Try looking for headers with "Eligibility" text
@@ -481,6 +587,8 @@ def scrape_grant_details(opportunity_id):
             logger.warning(f"Very little data found for grant {opportunity_id} - may need manual inspection")
         else:
             logger.debug(f"Found {len(grant_data)} fields for grant {opportunity_id}")
+        
+        save_cached_page(opportunity_id, response, grant_data)
             
         return grant_data
     except Exception as e:
@@ -488,21 +596,80 @@ def scrape_grant_details(opportunity_id):
         logger.error(traceback.format_exc())
         return None
 
-def process_grant(grant_id, table_client, force_update=False):
-    """Process a single grant: scrape data and update Azure table"""
-    try:
-        # Check if this grant is already in the Azure table (to avoid duplicate work)
+def open_staging_db():
+    """Open (creating if needed) the local staging database"""
+    conn = sqlite3.connect(STAGING_DB, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS grants (
+            rowkey TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            uploaded INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Rows older runs marked as uploaded instead of removing
+    conn.execute("DELETE FROM grants WHERE uploaded = 1")
+    conn.commit()
+    return conn
+
+def get_staged_ids(staging_conn):
+    """Get the IDs of grants scraped into the staging database but not yet uploaded"""
+    with staging_lock:
+        return {row[0] for row in staging_conn.execute("SELECT rowkey FROM grants WHERE uploaded = 0")}
+
+def stage_grant(staging_conn, grant_data):
+    """Save scraped grant data to the staging database, marking it for upload"""
+    with staging_lock, staging_conn:
+        staging_conn.execute(
+            "INSERT OR REPLACE INTO grants (rowkey, data, uploaded) VALUES (?, ?, 0)",
+            (grant_data["RowKey"], json.dumps(grant_data))
+        )
+
+def upload_staged_grants(staging_conn, table_client, batch_size=100):
+    """Upsert every staged grant not yet in Azure, one transaction per batch of batch_size rows
+    (the most Azure accepts; every grant shares the "Grant" partition)"""
+    uploaded = 0
+    last_rowkey = ""
+    
+    while True:
+        with staging_lock:
+            rows = staging_conn.execute(
+                "SELECT rowkey, data FROM grants WHERE uploaded = 0 AND rowkey > ? ORDER BY rowkey LIMIT ?",
+                (last_rowkey, batch_size)
+            ).fetchall()
+        if not rows:
+            break
+        last_rowkey = rows[-1][0]
+        
+        entities = [json.loads(data) for _, data in rows]
         try:
-            existing_grant = table_client.get_entity("Grant", grant_id)
-            
-            # Skip if we already have it and force_update is False
-            if not force_update:
-                logger.debug(f"Grant {grant_id} already in Azure table - skipping")
-                return False
+            table_client.submit_transaction([("upsert", entity) for entity in entities])
+            done = [(rowkey,) for rowkey, _ in rows]
         except Exception as e:
-            logger.debug(f"Grant {grant_id} not in table yet: {str(e)}")
-            # Grant doesn't exist yet
-            pass
+            # The whole transaction is rolled back on any failure - retry the rows one at a time
+            logger.warning(f"Batch upload of {len(rows)} grants failed, retrying individually: {str(e)}")
+            done = []
+            for entity in entities:
+                try:
+                    table_client.upsert_entity(entity)
+                    done.append((entity["RowKey"],))
+                except Exception as e:
+                    logger.error(f"Error uploading grant {entity['RowKey']}: {str(e)}")
+        
+        with staging_lock, staging_conn:
+            staging_conn.executemany("DELETE FROM grants WHERE rowkey = ?", done)
+        uploaded += len(done)
+    
+    return uploaded
+
+def process_grant(grant_id, staging_conn, force_update=False, sample_ids=frozenset(), existing_ids=frozenset()):
+    """Process a single grant: scrape data and stage it for upload to the Azure table"""
+    try:
+        # Skip grants already in the Azure table (to avoid duplicate work) unless force_update is set
+        if not force_update and grant_id in existing_ids:
+            logger.debug(f"Grant {grant_id} already in Azure table - skipping")
+            return False
         
         # Scrape grant data
         grant_data = scrape_grant_details(grant_id)
@@ -512,14 +679,14 @@ def process_grant(grant_id, table_client, force_update=False):
             return False
         
         # Show what we're going to insert (for the first few grants)
-        if grant_id in list(all_grant_ids)[:5]:  # Only for first 5 grants to avoid log spam
+        if grant_id in sample_ids:  # Only for first 5 grants to avoid log spam
             logger.info(f"Sample data for grant {grant_id}:")
             for key, value in sorted(grant_data.items())[:10]:  # Show first 10 fields
                 if key not in ["PartitionKey", "RowKey", "OpportunityURL"]:
                     logger.info(f"  {key}: {str(value)[:50]}...")
         
-        # Insert or update the grant in Azure Table
-        table_client.upsert_entity(grant_data)
+        # Stage the grant locally; upload_staged_grants sends it to the Azure Table
+        stage_grant(staging_conn, grant_data)
         logger.info(f"Successfully processed grant {grant_id}")
         return True
         
@@ -577,7 +744,6 @@ def main():
             logger.info(f"Processing specific grant: {specific_grant}")
     
     # Get grant IDs
-    global all_grant_ids
     all_grant_ids = set()
     
     if specific_grant:
@@ -613,27 +779,71 @@ def main():
     # Use fewer threads when debugging
     max_threads = 1 if debug_mode else min(10, len(all_grant_ids))
     
+    # Grants whose data gets logged as a sample
+    sample_ids = frozenset(list(all_grant_ids)[:5])
+    
+    staging_conn = open_staging_db()
+    
+    # Fetch the IDs already in the table in one projected query instead of a get_entity per grant;
+    # a single requested grant only needs its own lookup
+    existing_ids = frozenset()
+    if not (force_update or debug_mode):
+        if specific_grant:
+            try:
+                table_client.get_entity("Grant", specific_grant, select=["RowKey"])
+                existing_ids = frozenset([specific_grant])
+            except Exception as e:
+                logger.debug(f"Grant {specific_grant} not in table yet: {str(e)}")
+        else:
+            try:
+                logger.info("Checking for existing grants in the table...")
+                existing_ids = frozenset(
+                    entity["RowKey"]
+                    for entity in table_client.query_entities("PartitionKey eq 'Grant'", select=["RowKey"])
+                )
+                logger.info(f"Found {len(existing_ids)} existing grants in the table")
+            except Exception as e:
+                logger.error(f"Error querying existing grants: {str(e)}")
+        
+        # Grants scraped by an earlier, interrupted run only need uploading
+        existing_ids |= get_staged_ids(staging_conn)
+    
     with ThreadPoolExecutor(max_workers=max_threads) as executor:
-        # Submit all tasks
-        future_to_grant = {
-            executor.submit(process_grant, grant_id, table_client, force_update or debug_mode): grant_id 
-            for grant_id in all_grant_ids
-        }
+        # Keep a bounded window of in-flight tasks rather than submitting every grant up front,
+        # so finished futures (and their results) are released as soon as they are consumed
+        max_in_flight = max_threads * 4
+        pending_ids = iter(all_grant_ids)
+        future_to_grant = {}
         
         # Process results as they complete with a progress bar
-        with tqdm(total=len(future_to_grant), desc="Processing grants") as pbar:
-            for future in as_completed(future_to_grant):
-                grant_id = future_to_grant[future]
-                try:
-                    if future.result():
-                        successful += 1
-                    else:
-                        failed += 1
-                except Exception as e:
-                    logger.error(f"Grant {grant_id} generated an exception: {str(e)}")
-                    failed += 1
+        with tqdm(total=len(all_grant_ids), desc="Processing grants") as pbar:
+            while True:
+                # Top up the window
+                for grant_id in itertools.islice(pending_ids, max_in_flight - len(future_to_grant)):
+                    future = executor.submit(process_grant, grant_id, staging_conn, force_update or debug_mode, sample_ids, existing_ids)
+                    future_to_grant[future] = grant_id
+                
+                if not future_to_grant:
+                    break
                 
-                pbar.update(1)
+                done, _ = wait(future_to_grant, return_when=FIRST_COMPLETED)
+                for future in done:
+                    grant_id = future_to_grant.pop(future)
+                    try:
+                        if future.result():
+                            successful += 1
+                        else:
+                            failed += 1
+                    except Exception as e:
+                        logger.error(f"Grant {grant_id} generated an exception: {str(e)}")
+                        failed += 1
+                    
+                    pbar.update(1)
+    
+    # Upload everything staged (including leftovers from interrupted runs) to Azure
+    logger.info("Uploading staged grants to Azure Table Storage...")
+    uploaded = upload_staged_grants(staging_conn, table_client)
+    staging_conn.close()
     
     # Calculate elapsed time
     elapsed_time = time.time() - start_time
@@ -643,6 +853,7 @@ def main():
     logger.info(f"Total grants processed: {len(all_grant_ids)}")
     logger.info(f"Successfully updated: {successful}")
     logger.info(f"Failed: {failed}")
+    logger.info(f"Uploaded to Azure Table: {uploaded}")
     logger.info(f"Time elapsed: {elapsed_time:.2f} seconds ({elapsed_time/60:.2f} minutes)")
     logger.info("Collection complete")
     
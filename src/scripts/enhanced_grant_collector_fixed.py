@@ -5,34 +5,90 @@ import json
 import time
 import random
 import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from azure.data.tables import TableServiceClient, UpdateMode
+from azure.core.exceptions import ClientAuthenticationError
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from rate_limit import TokenBucket
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Grants.gov search API
+SEARCH_URL = "https://api.grants.gov/v1/api/search2"
+HEADERS = {"Content-Type": "application/json"}
+
+# Number of grant detail requests made in parallel
+DETAIL_WORKERS = 16
+
+# Maximum operations Azure Table Storage accepts in one transaction (all grants share a partition)
+TRANSACTION_BATCH_SIZE = 100
+
+# Shared by every request to the Grants.gov API (requests per second)
+REQUEST_BUCKET = TokenBucket(rate=10)
+
+# Numeric entity columns and their types; anything but digits, '.' and '-' is stripped before conversion
+NUMERIC_FIELDS = (
+    ("AwardCeiling", float),
+    ("AwardFloor", float),
+    ("EstimatedTotalProgramFunding", float),
+    ("ExpectedNumberofAwards", int),
+    ("ExpectedAwards", int)
+)
+NON_NUMERIC_RE = re.compile(r'[^0-9.\-]')
+
+# Null bytes are rejected by Azure Table string properties
+NULL_TRANS = str.maketrans('', '', '\x00')
+
+# Bulk-load mode (--bulk) writes entities to an NDJSON file and uploads it to blob storage instead of
+# writing each batch to the table; the ImportGrants function loads each uploaded blob into GrantDetails
+BULK_FILE = "grants.ndjson"
+BULK_CONTAINER = "grant-imports"
+BULK_UPLOAD_CONCURRENCY = 8
+
+# Connection string resolved through the Azure CLI is cached here (owner-only) to skip the CLI on later runs
+CONNECTION_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "grants_etl", "conn")
+
+# Shared HTTP session so every worker thread reuses pooled keep-alive connections;
+# transient 429/5xx responses are retried with backoff (honoring Retry-After) before we give up on a grant
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+))
+SESSION.headers.update(HEADERS)
+
 def clean_text(text):
     """Clean text for storage in Azure Table"""
     if text is None:
         return ""
-    return str(text).replace("\u0000", "").replace("\x00", "")
+    return str(text).translate(NULL_TRANS)
 
 def get_grant_details(grant_id):
     """Fetch detailed information about a specific grant"""
-    details_url = f"https://api.grants.gov/v1/api/search2/detail/{grant_id}"
-    headers = {"Content-Type": "application/json"}
+    details_url = f"{SEARCH_URL}/detail/{grant_id}"
     
     try:
-        # Add delay to avoid rate limiting
-        time.sleep(0.5)
+        # Wait for a slot in the shared rate limit
+        REQUEST_BUCKET.acquire()
         
-        response = requests.get(details_url, headers=headers, timeout=30)
+        response = SESSION.get(details_url, timeout=30)
         
         if response.status_code == 200:
-            data = response.json()
+            data = json.loads(response.content)
             
             # Check for error code
             if data.get("errorcode", 0) != 0:
@@ -50,10 +106,208 @@ def get_grant_details(grant_id):
         
     return None
 
-def get_connection_string():
+def search_grants(search_payload):
+    """Run a single search strategy and return the opportunities it found"""
+    logger.info(f"Searching with strategy: {search_payload}")
+    
+    try:
+        # Wait for a slot in the shared rate limit
+        REQUEST_BUCKET.acquire()
+        
+        # Make the API call
+        response = SESSION.post(SEARCH_URL, json=search_payload, timeout=30)
+        
+        # Check status code
+        if response.status_code != 200:
+            logger.warning(f"API returned status code {response.status_code}")
+            return []
+        
+        # Parse the response
+        try:
+            search_results = json.loads(response.content)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse API response: {str(e)}")
+            return []
+        
+        # Check for error code
+        if search_results.get("errorcode", 0) != 0:
+            logger.warning(f"API returned error: {search_results.get('msg', 'Unknown error')}")
+            return []
+        
+        if "data" in search_results and "oppHits" in search_results["data"]:
+            opportunities = search_results["data"]["oppHits"]
+            logger.info(f"Found {len(opportunities)} opportunities for {search_payload}")
+            return opportunities
+        
+        logger.warning("No opportunities found in the response")
+    except Exception as e:
+        logger.error(f"Error making API request: {str(e)}")
+    
+    return []
+
+def build_entity(opportunity_id, opportunity, last_updated):
+    """Create the Azure Table entity for a grant opportunity"""
+    entity = {
+        "PartitionKey": "Grant",
+        "RowKey": opportunity_id,
+        "Title": clean_text(opportunity.get("title", "")),
+        "Number": clean_text(opportunity.get("number", "")),
+        "AgencyCode": clean_text(opportunity.get("agencyCode", "")),
+        "AgencyName": clean_text(opportunity.get("agency", "")),
+        "Category": clean_text(opportunity.get("fundingCategory", "")),
+        "CategoryExplanation": clean_text(opportunity.get("fundingCategoryExplanation", "")),
+        "OpportunityCategory": clean_text(opportunity.get("opportunityCategory", "")), 
+        "OpportunityCategoryExplanation": clean_text(opportunity.get("opportunityCategoryExplanation", "")),
+        "CFDANumbers": clean_text(opportunity.get("cfda", "")),
+        "Description": clean_text(opportunity.get("description", "")),
+        "CloseDate": clean_text(opportunity.get("closeDate", "")),
+        "OpenDate": clean_text(opportunity.get("openDate", "")),
+        "OriginalCloseDate": clean_text(opportunity.get("originalCloseDate", "")),
+        "ArchiveDate": clean_text(opportunity.get("archiveDate", "")),
+        "AwardFloor": clean_text(opportunity.get("awardFloor", "")),
+        "AwardCeiling": clean_text(opportunity.get("awardCeiling", "")),
+        "EstimatedTotalProgramFunding": clean_text(opportunity.get("estimatedTotalProgramFunding", "")),
+        "ExpectedNumberofAwards": clean_text(opportunity.get("expectedNumOfAwards", "")),
+        # Still read and written under the old name by the scraper, verifier and other collectors
+        "ExpectedAwards": clean_text(opportunity.get("expectedNumOfAwards", "")),
+        "DocType": clean_text(opportunity.get("docType", "")),
+        "FundingType": clean_text(opportunity.get("fundingInstrument", "")),
+        "CostSharing": clean_text(opportunity.get("costSharing", "No")),
+        "Version": clean_text(opportunity.get("version", "")),
+        "LastUpdated": last_updated,
+        "EligibleApplicants": clean_text(opportunity.get("eligibleApplicants", "")),
+        "AdditionalEligibilityInfo": clean_text(opportunity.get("additionalEligibilityInfo", "")),
+        "AdditionalInfoLink": clean_text(opportunity.get("additionalInfoUrl", "")),
+        "GrantorContact": clean_text(opportunity.get("grantorContact", "")),
+        "OpportunityURL": f"https://www.grants.gov/search-results-detail/{opportunity_id}",
+        "DataTypesFixed": True
+    }
+    
+    # Convert numeric fields to proper types
+    for field, converter in NUMERIC_FIELDS:
+        if field in entity and entity[field]:
+            try:
+                value = entity[field]
+                if isinstance(value, str):
+                    cleaned = NON_NUMERIC_RE.sub('', value)
+                    entity[field] = converter(cleaned) if cleaned else 0
+            except (ValueError, TypeError):
+                entity[field] = 0
+    
+    return entity
+
+def upsert_entities(table_client, entities):
+    """Upsert a batch of entities in one transaction, falling back to one call per entity.
+    Returns the RowKeys of the entities written."""
+    try:
+        table_client.submit_transaction([("upsert", entity, {"mode": UpdateMode.MERGE}) for entity in entities])
+        return [entity["RowKey"] for entity in entities]
+    except Exception as e:
+        logger.warning(f"Batch upsert of {len(entities)} grants failed, retrying individually: {str(e)}")
+    
+    written = []
+    for entity in entities:
+        try:
+            table_client.upsert_entity(entity, mode=UpdateMode.MERGE)
+            written.append(entity["RowKey"])
+        except Exception as e:
+            logger.error(f"Error storing grant {entity['RowKey']}: {str(e)}")
+    return written
+
+def write_bulk_entities(bulk_file, entities):
+    """Append entities to the bulk NDJSON file, one JSON object per line.
+    Returns the RowKeys of the entities written."""
+    bulk_file.writelines(json.dumps(entity, ensure_ascii=False) + "\n" for entity in entities)
+    return [entity["RowKey"] for entity in entities]
+
+def upload_bulk_file(connection_string):
+    """Upload the bulk NDJSON file to blob storage, where ImportGrants picks it up.
+    Returns the blob name, or None if the upload failed."""
+    try:
+        from azure.storage.blob import BlobServiceClient
+    except ImportError:
+        logger.error(f"azure-storage-blob is not installed; {BULK_FILE} was left for manual upload")
+        return None
+    
+    blob_name = f"grants_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.ndjson"
+    try:
+        container_client = BlobServiceClient.from_connection_string(connection_string).get_container_client(BULK_CONTAINER)
+        try:
+            container_client.create_container()
+        except Exception as e:
+            logger.info(f"Container likely exists already: {str(e)}")
+        
+        with open(BULK_FILE, "rb") as f:
+            container_client.upload_blob(blob_name, f, overwrite=True, max_concurrency=BULK_UPLOAD_CONCURRENCY)
+        logger.info(f"Uploaded {BULK_FILE} to {BULK_CONTAINER}/{blob_name}")
+        return blob_name
+    except Exception as e:
+        logger.error(f"Error uploading {BULK_FILE}: {str(e)}")
+        return None
+
+def store_batch(table_client, bulk_file, entities):
+    """Store a batch of entities in the bulk file when bulk-loading, otherwise in the table.
+    Returns the RowKeys of the entities written."""
+    if bulk_file:
+        return write_bulk_entities(bulk_file, entities)
+    return upsert_entities(table_client, entities)
+
+def load_known_ids(table_client):
+    """Get the IDs of every grant already stored in the table, reading only the RowKey column"""
+    known_ids = set()
+    try:
+        logger.info("Checking for existing grants in the table...")
+        entities = table_client.query_entities(
+            query_filter="PartitionKey eq 'Grant'",
+            select=["RowKey"],
+            results_per_page=1000
+        )
+        for entity in entities:
+            known_ids.add(entity.get("RowKey", ""))
+        logger.info(f"Found {len(known_ids)} existing grants in the table")
+    except Exception as e:
+        logger.error(f"Error querying existing grants: {str(e)}")
+    return known_ids
+
+def load_cached_connection_string():
+    """Read the connection string cached by a previous run, if any"""
+    try:
+        with open(CONNECTION_CACHE_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Could not read cached connection string: {str(e)}")
+        return None
+
+def save_cached_connection_string(connection_string):
+    """Atomically cache the connection string in a file readable only by the current user"""
+    tmp_path = f"{CONNECTION_CACHE_FILE}.tmp"
+    try:
+        os.makedirs(os.path.dirname(CONNECTION_CACHE_FILE), mode=0o700, exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(connection_string)
+        os.replace(tmp_path, CONNECTION_CACHE_FILE)
+    except Exception as e:
+        logger.warning(f"Could not cache connection string: {str(e)}")
+
+def clear_cached_connection_string():
+    """Forget the cached connection string, e.g. after the account keys were rotated"""
+    try:
+        os.remove(CONNECTION_CACHE_FILE)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not remove cached connection string: {str(e)}")
+
+def get_connection_string(use_cache=True):
     """Get Azure Storage connection string"""
     connection_string = os.environ.get("STORAGE_CONNECTION")
     
+    if not connection_string and use_cache:
+        connection_string = load_cached_connection_string()
+    
     if not connection_string:
         # Try to get it from Azure CLI
         import subprocess
@@ -68,6 +322,7 @@ def get_connection_string():
             
             if result.returncode == 0 and result.stdout.strip():
                 connection_string = result.stdout.strip()
+                save_cached_connection_string(connection_string)
             else:
                 logger.error("Failed to get connection string from Azure CLI")
                 return None
@@ -77,6 +332,22 @@ def get_connection_string():
     
     return connection_string
 
+def connect_table(connection_string, table_name="GrantDetails"):
+    """Get a client for the grants table, creating the table if it doesn't exist.
+    Raises ClientAuthenticationError if the connection string's key is rejected."""
+    table_service = TableServiceClient.from_connection_string(connection_string)
+    
+    # Create table if it doesn't exist
+    try:
+        table_service.create_table(table_name)
+        logger.info(f"Table '{table_name}' created.")
+    except ClientAuthenticationError:
+        raise
+    except Exception as e:
+        logger.info(f"Table likely exists already: {str(e)}")
+    
+    return table_service.get_table_client(table_name)
+
 def main():
     """Collect a large number of grants from Grants.gov API with enhanced strategies"""
     connection_string = get_connection_string()
@@ -91,27 +362,25 @@ def main():
     # Initialize table client
     try:
         logger.info("Connecting to Azure Storage...")
-        table_service = TableServiceClient.from_connection_string(connection_string)
-        
-        # Create table if it doesn't exist
-        table_name = "GrantDetails"
         try:
-            table_service.create_table(table_name)
-            logger.info(f"Table '{table_name}' created.")
-        except Exception as e:
-            logger.info(f"Table likely exists already: {str(e)}")
+            table_client = connect_table(connection_string)
+        except ClientAuthenticationError as e:
+            if os.environ.get("STORAGE_CONNECTION"):
+                raise
+            # The cached connection string goes stale when the account keys are rotated -
+            # drop it and ask the Azure CLI for a fresh one, once
+            logger.warning(f"Azure rejected the cached connection string, fetching a new one: {str(e)}")
+            clear_cached_connection_string()
+            connection_string = get_connection_string(use_cache=False)
+            if not connection_string:
+                return
+            table_client = connect_table(connection_string)
         
-        # Get table client
-        table_client = table_service.get_table_client(table_name)
         logger.info("Connected to Azure Table Storage successfully")
     except Exception as e:
         logger.error(f"Failed to connect to Azure Storage: {str(e)}")
         return
     
-    # Configuration for grants collection
-    search_url = "https://api.grants.gov/v1/api/search2"
-    headers = {"Content-Type": "application/json"}
-    
     # Create search strategies to get different types of grants
     search_strategies = [
         {"keyword": "health research", "rows": 100},
@@ -124,172 +393,119 @@ def main():
         {"sortBy": "openDate|desc", "rows": 100}
     ]
     
+    # Bulk mode writes entities to a file for blob import instead of the table
+    bulk_mode = "--bulk" in sys.argv
+    bulk_file = open(BULK_FILE, "w", encoding="utf-8") if bulk_mode else None
+    if bulk_mode:
+        logger.info(f"Bulk mode: writing grants to {BULK_FILE} for blob import")
+    
     # Track stats
     total_grants_found = 0
     total_grants_added = 0
-    processed_ids = set()
+    duplicate_listings = 0
+    already_stored = 0
     
     # Get existing grant IDs to avoid duplicates
-    try:
-        logger.info("Checking for existing grants in the table...")
-        entities = table_client.query_entities("PartitionKey eq 'Grant'")
-        for entity in entities:
-            processed_ids.add(entity.get("RowKey", ""))
-        logger.info(f"Found {len(processed_ids)} existing grants in the table")
-    except Exception as e:
-        logger.error(f"Error querying existing grants: {str(e)}")
+    known_ids = load_known_ids(table_client)
+    
+    start_time = time.monotonic()
     
-    start_time = time.time()
+    # Every grant stored in this run shares the same collection timestamp
+    last_updated = datetime.now(timezone.utc).isoformat()
     
-    # Process each search strategy
-    for strategy_index, search_payload in enumerate(search_strategies):
-        logger.info(f"Strategy {strategy_index+1}/{len(search_strategies)}: {search_payload}")
+    new_opportunities = {}
+    future_to_id = {}
+    
+    with ThreadPoolExecutor(max_workers=DETAIL_WORKERS) as detail_executor:
+        # Run all search strategies in parallel; detail fetches for new grants start as soon as
+        # any strategy's results arrive, in completion order, so one slow search doesn't hold up the rest
+        with ThreadPoolExecutor(max_workers=len(search_strategies)) as search_executor:
+            search_futures = [search_executor.submit(search_grants, strategy) for strategy in search_strategies]
+            for search_future in as_completed(search_futures):
+                opportunities = search_future.result()
+                # Track total found (including duplicates across strategies)
+                total_grants_found += len(opportunities)
+                
+                for opportunity in opportunities:
+                    opportunity_id = opportunity.get("id")
+                    
+                    # Skip IDs another strategy already returned, and grants already in the table,
+                    # so each unique new grant costs exactly one detail fetch
+                    if not opportunity_id:
+                        continue
+                    if opportunity_id in new_opportunities:
+                        duplicate_listings += 1
+                        continue
+                    if opportunity_id in known_ids:
+                        already_stored += 1
+                        continue
+                    
+                    new_opportunities[opportunity_id] = opportunity
+                    future = detail_executor.submit(get_grant_details, opportunity_id)
+                    future_to_id[future] = opportunity_id
         
-        try:
-            # Add a delay to avoid rate limiting
-            time.sleep(1)
-            
-            # Make the API call
-            response = requests.post(search_url, headers=headers, json=search_payload)
-            
-            # Check status code
-            if response.status_code != 200:
-                logger.warning(f"API returned status code {response.status_code}")
-                continue
+        logger.info(f"Fetching details for {len(new_opportunities)} new grants "
+                    f"(skipped {duplicate_listings} cross-strategy duplicates, {already_stored} already stored)")
+        
+        # Store grants in transaction-sized batches as their details arrive
+        batch = []
+        for future in as_completed(future_to_id):
+            opportunity_id = future_to_id[future]
+            opportunity = new_opportunities[opportunity_id]
             
-            # Parse the response
             try:
-                search_results = response.json()
+                # Merge the detailed info with the basic info we already have
+                detailed_info = future.result()
+                if detailed_info:
+                    opportunity.update(detailed_info)
                 
-                # Check for error code
-                if search_results.get("errorcode", 0) != 0:
-                    logger.warning(f"API returned error: {search_results.get('msg', 'Unknown error')}")
-                    continue
-                
-                # Process the data
-                if "data" in search_results and "oppHits" in search_results["data"]:
-                    opportunities = search_results["data"]["oppHits"]
-                    logger.info(f"Found {len(opportunities)} opportunities")
-                    
-                    # Track total found (including duplicates across strategies)
-                    total_grants_found += len(opportunities)
-                    
-                    # Process each grant opportunity
-                    for opportunity in opportunities:
-                        try:
-                            # Get the grant ID
-                            opportunity_id = opportunity.get("id")
-                            if not opportunity_id:
-                                continue
-                                
-                            # Skip if we've already processed this ID (avoid duplicates)
-                            if opportunity_id in processed_ids:
-                                continue
-                            
-                            # Add to processed set
-                            processed_ids.add(opportunity_id)
-
-                            # Get detailed information for this grant
-                            detailed_info = get_grant_details(opportunity_id)
-                            if detailed_info:
-                                # Merge the detailed info with the basic info we already have
-                                for key, value in detailed_info.items():
-                                    opportunity[key] = value
-                            
-                            # Create entity for Azure Table Storage
-                            entity = {
-                                "PartitionKey": "Grant",
-                                "RowKey": opportunity_id,
-                                "Title": clean_text(opportunity.get("title", "")),
-                                "Number": clean_text(opportunity.get("number", "")),
-                                "AgencyCode": clean_text(opportunity.get("agencyCode", "")),
-                                "AgencyName": clean_text(opportunity.get("agency", "")),
-                                "Category": clean_text(opportunity.get("fundingCategory", "")),
-                                "CategoryExplanation": clean_text(opportunity.get("fundingCategoryExplanation", "")),
-                                "OpportunityCategory": clean_text(opportunity.get("opportunityCategory", "")), 
-                                "OpportunityCategoryExplanation": clean_text(opportunity.get("opportunityCategoryExplanation", "")),
-                                "CFDANumbers": clean_text(opportunity.get("cfda", "")),
-                                "AssistanceListings": clean_text(opportunity.get("cfda", "")),
-                                "Description": clean_text(opportunity.get("description", "")),
-                                "CloseDate": clean_text(opportunity.get("closeDate", "")),
-                                "OpenDate": clean_text(opportunity.get("openDate", "")),
-                                "OriginalCloseDate": clean_text(opportunity.get("originalCloseDate", "")),
-                                "ArchiveDate": clean_text(opportunity.get("archiveDate", "")),
-                                "AwardFloor": clean_text(opportunity.get("awardFloor", "")),
-                                "AwardCeiling": clean_text(opportunity.get("awardCeiling", "")),
-                                "EstimatedTotalProgramFunding": clean_text(opportunity.get("estimatedTotalProgramFunding", "")),
-                                "ExpectedAwards": clean_text(opportunity.get("expectedNumOfAwards", "")),
-                                "ExpectedNumberofAwards": clean_text(opportunity.get("expectedNumOfAwards", "")),
-                                "DocType": clean_text(opportunity.get("docType", "")),
-                                "FundingType": clean_text(opportunity.get("fundingInstrument", "")),
-                                "CostSharing": clean_text(opportunity.get("costSharing", "No")),
-                                "Version": clean_text(opportunity.get("version", "")),
-                                "LastUpdated": datetime.now().isoformat(),
-                                "EligibleApplicants": clean_text(opportunity.get("eligibleApplicants", "")),
-                                "AdditionalEligibilityInfo": clean_text(opportunity.get("additionalEligibilityInfo", "")),
-                                "AdditionalInfoLink": clean_text(opportunity.get("additionalInfoUrl", "")),
-                                "GrantorContact": clean_text(opportunity.get("grantorContact", "")),
-                                "OpportunityURL": f"https://www.grants.gov/search-results-detail/{opportunity_id}",
-                                "DataTypesFixed": True
-                            }
-                            
-                            # Convert numeric fields to proper types
-                            numeric_fields = {
-                                "AwardCeiling": float,
-                                "AwardFloor": float,
-                                "EstimatedTotalProgramFunding": float,
-                                "ExpectedNumberofAwards": int,
-                                "ExpectedAwards": int
-                            }
-
-                            # Process numeric fields
-                            for field, converter in numeric_fields.items():
-                                if field in entity and entity[field]:
-                                    try:
-                                        value = entity[field]
-                                        if isinstance(value, str):
-                                            value = value.replace('$', '').replace(',', '')
-                                            value = re.sub(r'[^0-9\.\-]', '', value)
-                                            if value:
-                                                entity[field] = converter(value)
-                                            else:
-                                                entity[field] = 0
-                                    except (ValueError, TypeError):
-                                        entity[field] = 0
-                            
-                            # Add to table (just once)
-                            table_client.upsert_entity(entity, mode=UpdateMode.MERGE)
-                            
-                            # Update counter
-                            total_grants_added += 1
-                            
-                            # Provide periodic updates for large collections
-                            if total_grants_added % 20 == 0:
-                                elapsed = time.time() - start_time
-                                logger.info(f"Progress: Added {total_grants_added} grants ({total_grants_added/elapsed:.2f} grants/sec)")
-                                
-                        except Exception as e:
-                            logger.error(f"Error processing opportunity {opportunity.get('id', 'unknown')}: {str(e)}")
-                else:
-                    logger.warning("No opportunities found in the response")
+                batch.append(build_entity(opportunity_id, opportunity, last_updated))
+            except Exception as e:
+                logger.error(f"Error processing opportunity {opportunity_id}: {str(e)}")
+                continue
             
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse API response: {str(e)}")
+            if len(batch) == TRANSACTION_BATCH_SIZE:
+                written = store_batch(table_client, bulk_file, batch)
+                total_grants_added += len(written)
+                batch = []
+                
+                # Provide periodic updates for large collections
+                if logger.isEnabledFor(logging.INFO):
+                    elapsed = time.monotonic() - start_time
+                    logger.info(f"Progress: Added {total_grants_added} grants ({total_grants_added/elapsed:.2f} grants/sec)")
         
-        except Exception as e:
-            logger.error(f"Error making API request: {str(e)}")
+        # Store the final partial batch
+        if batch:
+            written = store_batch(table_client, bulk_file, batch)
+            total_grants_added += len(written)
+    
+    # Ship the bulk file to blob storage for import
+    blob_name = None
+    if bulk_mode:
+        bulk_file.close()
+        blob_name = upload_bulk_file(connection_string)
     
     # Calculate time elapsed
-    elapsed_time = time.time() - start_time
+    elapsed_time = time.monotonic() - start_time
     
     # Print summary
     logger.info("\n\n=== COLLECTION SUMMARY ===")
     logger.info(f"Total grants found (including duplicates): {total_grants_found}")
-    logger.info(f"Unique grants processed: {len(processed_ids)}")
-    logger.info(f"New grants added to Azure Table: {total_grants_added}")
+    logger.info(f"Unique new grants processed: {len(new_opportunities)}")
+    if bulk_mode:
+        logger.info(f"New grants written to {BULK_FILE}: {total_grants_added}")
+    else:
+        logger.info(f"New grants added to Azure Table: {total_grants_added}")
     logger.info(f"Time elapsed: {elapsed_time:.2f} seconds ({elapsed_time/60:.2f} minutes)")
     logger.info("Collection complete")
     
+    # Bulk-written grants only reach the table through the ImportGrants function
+    if bulk_mode:
+        if blob_name:
+            logger.info(f"Grants will be in the table once ImportGrants has loaded {BULK_CONTAINER}/{blob_name}")
+        else:
+            logger.warning(f"{BULK_FILE} was not uploaded; upload it to the {BULK_CONTAINER} container to import the grants")
+    
     # Provide next steps
     logger.info("\nNext Steps:")
     logger.info("1. View your grants at: https://grantsgovfunc60542.azurewebsites.net/api/grantsviewer?format=html&limit=1000")
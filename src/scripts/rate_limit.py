@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+import time
+import threading
+
+class TokenBucket:
+    """Thread-safe limiter capping the aggregate request rate across all worker threads"""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block only as long as needed to stay under the configured rate"""
+        with self.lock:
+            now = time.monotonic()
+            wait = max(0.0, self.next_time - now)
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait:
+            time.sleep(wait)
+    
+    def pause(self, seconds):
+        """Hold back every worker using this bucket, e.g. after the host has rate limited us"""
+        with self.lock:
+            self.next_time = max(self.next_time, time.monotonic() + seconds)
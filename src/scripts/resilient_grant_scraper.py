@@ -8,9 +8,18 @@ import sys
 import re
 import random
 import traceback
-from bs4 import BeautifulSoup
+import shelve
+import threading
+import lxml.etree
+import lxml.html
+from requests.adapters import HTTPAdapter
+from functools import lru_cache
+from itertools import islice
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from azure.data.tables import TableServiceClient, UpdateMode
+from azure.data.tables import TableServiceClient, TableTransactionError, UpdateMode
+from rate_limit import TokenBucket
 
 # Set up logging
 logging.basicConfig(
@@ -23,8 +32,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Field mappings - combine all possible field names from grants.gov
-FIELD_MAPPINGS = {
+# Field mappings - combine all possible field names from grants.gov (read-only, keyed by casefolded label)
+FIELD_MAPPINGS = MappingProxyType({label.casefold(): field for label, field in {
     "Opportunity Number": "OpportunityNumber",
     "Opportunity ID": "OpportunityID",
     "Opportunity Title": "Title",
@@ -44,7 +53,174 @@ FIELD_MAPPINGS = {
     "Original Close Date": "OriginalCloseDate",
     "Archive Date": "ArchiveDate",
     "Estimated Total Program Funding": "EstimatedTotalProgramFunding",
+}.items()})
+
+# Reverse lookup: Azure column -> every label that maps to it
+FIELD_LABELS = MappingProxyType({
+    field: tuple(label for label, target in FIELD_MAPPINGS.items() if target == field)
+    for field in set(FIELD_MAPPINGS.values())
+})
+
+def field_label_pattern(field):
+    """Regex alternation matching any label of an Azure column, longest label first"""
+    return '(?:' + '|'.join(re.escape(label) for label in sorted(FIELD_LABELS[field], key=len, reverse=True)) + ')'
+
+# The only elements the extractors look at
+PAGE_TAGS = ('table', 'section', 'div', 'span', 'script')
+# Text inside the extractor elements, without script contents
+VISIBLE_TEXT_XPATH = lxml.etree.XPath(
+    '//*[self::table or self::section or self::div or self::span]'
+    '//text()[not(ancestor::script) and not(ancestor::style)]'
+)
+
+def env_setting(name, default, converter, minimum):
+    """Read a numeric setting from the environment. Values that don't parse fall back to the default,
+    values below the minimum are raised to it; either way a warning is logged."""
+    raw_value = os.environ.get(name)
+    if raw_value is None:
+        return default
+    try:
+        value = converter(raw_value)
+    except ValueError:
+        logger.warning(f"Invalid {name}={raw_value!r}, using the default of {default}")
+        return default
+    if not value >= minimum:
+        logger.warning(f"{name}={raw_value!r} is below the minimum, using {minimum}")
+        return minimum
+    return value
+
+# Number of grants fixed at the same time. The per-host rate limits still cap request volume,
+# so this can be raised (FIX_WORKERS env var) when the hosts allow a higher rate
+FIX_WORKERS = env_setting("FIX_WORKERS", 5, int, 1)
+
+# Shared HTTP session so www.grants.gov and api.grants.gov connections are kept alive across
+# URL formats, retries and grants; retries stay in our own loops
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=max(32, FIX_WORKERS), max_retries=0))
+SESSION.headers.update({
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+})
+
+# Award details sit near the top of a grant page; anything past this is not downloaded or parsed
+MAX_PAGE_BYTES = 512 * 1024
+
+# Fixes are merged back in batches; Azure Table transactions hold at most 100 operations
+TRANSACTION_BATCH_SIZE = 100
+
+# RowKeys OR-ed into one query when fetching specific grants, keeping the filter URL short
+ROWKEY_FILTER_CHUNK = 15
+
+# The only columns fix_grant reads, so queries don't ship whole grant entities
+FIX_FIELDS = ["PartitionKey", "RowKey", "AwardCeiling", "AwardFloor", "ExpectedNumberofAwards", "ExpectedAwards", "FundingType"]
+
+# Requests per second allowed against each Grants.gov host. Backoff after a 403/429 pauses the
+# host's bucket, so all workers wait it out together instead of each sleeping on its own
+SCRAPER_RATE_LIMIT = env_setting("SCRAPER_RATE_LIMIT", 1.0, float, 0.1)
+API_RATE_LIMIT = env_setting("API_RATE_LIMIT", 2.0, float, 0.1)
+WEB_BUCKET = TokenBucket(rate=SCRAPER_RATE_LIMIT)
+API_BUCKET = TokenBucket(rate=API_RATE_LIMIT)
+
+class CircuitBreaker:
+    """Per-endpoint breaker: stop calling an endpoint after repeated failures and probe it again after a cooldown"""
+    
+    def __init__(self, failure_threshold=5, cooldown=600):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.circuits = {}
+        self.lock = threading.Lock()
+    
+    def allow(self, key):
+        """Return True if a request to this endpoint may be sent"""
+        with self.lock:
+            circuit = self.circuits.get(key)
+            if circuit is None or circuit["state"] == "CLOSED":
+                return True
+            if circuit["state"] == "OPEN" and time.monotonic() - circuit["opened_at"] >= self.cooldown:
+                circuit["state"] = "HALF_OPEN"
+                logger.info(f"Circuit for {key} is half-open, sending a probe request")
+                return True
+            return False
+    
+    def record(self, key, success):
+        """Record the outcome of a request, opening or closing the circuit as needed"""
+        with self.lock:
+            circuit = self.circuits.setdefault(key, {"failures": 0, "opened_at": 0.0, "state": "CLOSED"})
+            if success:
+                if circuit["state"] != "CLOSED":
+                    logger.info(f"Circuit for {key} closed again")
+                circuit.update(failures=0, state="CLOSED")
+                return
+            
+            circuit["failures"] += 1
+            if circuit["state"] == "HALF_OPEN" or circuit["failures"] >= self.failure_threshold:
+                if circuit["state"] != "OPEN":
+                    logger.warning(f"Circuit for {key} opened after {circuit['failures']} consecutive failures")
+                circuit.update(state="OPEN", opened_at=time.monotonic())
+
+# Grant page URL formats, tried in order; each one has its own circuit
+WEB_URL_TEMPLATES = (
+    "https://www.grants.gov/search-results-detail/{opportunity_id}",
+    "https://www.grants.gov/search-grants/view-grant.html?oppId={opportunity_id}",
+    "https://www.grants.gov/web/grants/view-opportunity.html?oppId={opportunity_id}"  # Older URL format
+)
+CIRCUIT_BREAKER = CircuitBreaker()
+
+# On-disk cache of fetched pages, API results and successful extractions, so reruns skip re-scraping
+SCRAPE_CACHE_FILE = "grant_scrape_cache"
+SCRAPE_CACHE_TTL = 24 * 60 * 60
+scrape_cache_lock = threading.Lock()
+
+# Per-request headers layered on top of the session defaults
+JSON_HEADERS = {"Accept": "application/json"}
+HTML_HEADERS = {"Accept": "text/html,application/xhtml+xml,application/xml"}
+API_HEADERS = {"Content-Type": "application/json"}
+
+# Date formats seen on Grants.gov, tried in order
+DATE_FORMATS = (
+    "%m/%d/%Y", "%m-%d-%Y", "%Y-%m-%d",
+    "%m/%d/%Y %I:%M %p", "%m-%d-%Y %I:%M %p", "%Y-%m-%d %I:%M %p",
+    "%m/%d/%Y %H:%M", "%m-%d-%Y %H:%M", "%Y-%m-%d %H:%M"
+)
+
+# Precompiled patterns for numeric cleanup and award extraction
+NON_FLOAT_RE = re.compile(r'[^\d.-]')
+NON_INT_RE = re.compile(r'[^\d-]')
+NON_DECIMAL_RE = re.compile(r'[^\d.]')
+NON_DIGIT_RE = re.compile(r'[^\d]')
+SECTION_CEILING_RE = re.compile(field_label_pattern("AwardCeiling") + r':?\s*\$?([0-9,\.]+)', re.IGNORECASE)
+SECTION_FLOOR_RE = re.compile(field_label_pattern("AwardFloor") + r':?\s*\$?([0-9,\.]+)', re.IGNORECASE)
+SECTION_AWARDS_RE = re.compile(field_label_pattern("ExpectedNumberofAwards") + r':?\s*([0-9,]+)', re.IGNORECASE)
+AMOUNT_RE = re.compile(r'\$?([0-9,\.]+)')
+# Free-text sweep: an award label followed, within 80 non-numeric characters, by its amount
+TEXT_AMOUNT_RE = re.compile(
+    r'(?P<kind>award ceiling|maximum award|award floor|minimum award|expected number of awards)'
+    r'[^$\d]{0,80}?\$?\s*(?P<value>[0-9][0-9,]*(?:\.[0-9]+)?)',
+    re.IGNORECASE
+)
+TEXT_AMOUNT_FIELDS = {
+    "award ceiling": "awardCeiling",
+    "maximum award": "awardCeiling",
+    "award floor": "awardFloor",
+    "minimum award": "awardFloor",
+    "expected number of awards": "expectedNumOfAwards",
 }
+# Every extractor needs at least one of these words somewhere in the raw page bytes
+AWARD_HINT_RE = re.compile(rb'ceiling|floor|maximum|minimum|award', re.IGNORECASE)
+# Table row labels: ceiling wins over floor, which wins over award count, wherever they appear in the label
+TABLE_LABEL_RE = re.compile(
+    r'(?=.*(?P<ceiling>ceiling|max award))|(?=.*(?P<floor>floor|min award))|(?=.*(?P<awards>num awards|number of awards))',
+    re.IGNORECASE | re.DOTALL
+)
+TABLE_LABEL_FIELDS = {
+    "ceiling": ("awardCeiling", NON_DECIMAL_RE, "award ceiling"),
+    "floor": ("awardFloor", NON_DECIMAL_RE, "award floor"),
+    "awards": ("expectedNumOfAwards", NON_DIGIT_RE, "expected awards"),
+}
+# Embedded JSON keys
+CEILING_KEYS = ("ceiling", "maximum")
+FLOOR_KEYS = ("floor", "minimum")
+AWARD_KEY_HINT_RE = re.compile(r'ceiling|maximum|floor|minimum|expected', re.IGNORECASE)
 
 def get_connection_string():
     """Get Azure Storage connection string"""
@@ -70,16 +246,21 @@ def safe_float(value, default=0.0):
         return float(value)
     
     if isinstance(value, str):
-        # Remove any non-numeric characters except decimal point
-        value = re.sub(r'[^\d.-]', '', value)
-        
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return default
+        parsed = parse_float_string(value)
+        return default if parsed is None else parsed
     
     return default
 
+@lru_cache(maxsize=4096)
+def parse_float_string(value):
+    """Parse a numeric string to float, or None if it holds no number. Cached because
+    the same strings ("0", "", "500000") come up for many grants"""
+    # Remove any non-numeric characters except decimal point
+    try:
+        return float(NON_FLOAT_RE.sub('', value))
+    except ValueError:
+        return None
+
 def safe_int(value, default=0):
     """Convert value to int safely"""
     if value is None:
@@ -92,29 +273,31 @@ def safe_int(value, default=0):
         return int(value)
     
     if isinstance(value, str):
-        # Remove any non-numeric characters
-        value = re.sub(r'[^\d-]', '', value)
-        
-        try:
-            return int(value)
-        except (ValueError, TypeError):
-            return default
+        parsed = parse_int_string(value)
+        return default if parsed is None else parsed
     
     return default
 
+@lru_cache(maxsize=4096)
+def parse_int_string(value):
+    """Parse a numeric string to int, or None if it holds no number"""
+    # Remove any non-numeric characters
+    try:
+        return int(NON_INT_RE.sub('', value))
+    except ValueError:
+        return None
+
 def format_date(date_str):
     """Format date for Azure storage"""
     if not date_str:
         return None
-        
-    # Try different date formats
-    date_formats = [
-        "%m/%d/%Y", "%m-%d-%Y", "%Y-%m-%d",
-        "%m/%d/%Y %I:%M %p", "%m-%d-%Y %I:%M %p", "%Y-%m-%d %I:%M %p",
-        "%m/%d/%Y %H:%M", "%m-%d-%Y %H:%M", "%Y-%m-%d %H:%M"
-    ]
     
-    for fmt in date_formats:
+    return parse_date_string(date_str)
+
+@lru_cache(maxsize=4096)
+def parse_date_string(date_str):
+    """Try each known date format in turn. Cached since most grants share a few dates"""
+    for fmt in DATE_FORMATS:
         try:
             date_obj = datetime.strptime(date_str, fmt)
             return date_obj.isoformat()
@@ -124,21 +307,67 @@ def format_date(date_str):
     # Return original if we can't parse it
     return date_str
 
+def get_cached_response(key):
+    """Return a cached page or result if it is younger than the cache TTL"""
+    try:
+        with scrape_cache_lock, shelve.open(SCRAPE_CACHE_FILE) as cache:
+            entry = cache.get(key)
+    except Exception as e:
+        logger.debug(f"Could not read scrape cache for {key}: {str(e)}")
+        return None
+    
+    if entry and time.time() - entry["fetched_at"] < SCRAPE_CACHE_TTL:
+        return entry["value"]
+    return None
+
+def save_cached_response(key, value):
+    """Store a page or result in the scrape cache"""
+    try:
+        with scrape_cache_lock, shelve.open(SCRAPE_CACHE_FILE) as cache:
+            cache[key] = {"fetched_at": time.time(), "value": value}
+    except Exception as e:
+        logger.debug(f"Could not write scrape cache for {key}: {str(e)}")
+
+def get_backoff_time(retry, response=None):
+    """Exponential backoff with jitter, or the server's Retry-After when it sends one"""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return (2 ** retry) + random.uniform(1, 3)
+
+def read_page_body(response):
+    """Read a streamed page body up to MAX_PAGE_BYTES, then release the connection"""
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= MAX_PAGE_BYTES:
+                logger.warning(f"Page {response.url} is larger than {MAX_PAGE_BYTES} bytes, truncating")
+                break
+    finally:
+        # A fully read body goes back to the pool; a truncated one closes its connection
+        response.close()
+    return b"".join(chunks)[:MAX_PAGE_BYTES]
+
 def get_grant_json_data(grant_id):
     """Try to get grant data from JSON endpoints"""
+    if not CIRCUIT_BREAKER.allow("grantsws"):
+        logger.info("Skipping JSON endpoint: circuit open")
+        return None
+    
     try:
         # Try JSON endpoint
         url = f"https://www.grants.gov/grantsws/rest/opportunity/details/{grant_id}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko)",
-            "Accept": "application/json"
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
+        # Same host as the web pages, so share their rate limit
+        WEB_BUCKET.acquire()
+        response = SESSION.get(url, headers=JSON_HEADERS, timeout=30)
+        CIRCUIT_BREAKER.record("grantsws", response.status_code == 200)
         
         if response.status_code == 200:
             try:
-                data = response.json()
+                data = json.loads(response.content)
                 logger.info(f"Successfully retrieved JSON data for grant {grant_id}")
                 return data
             except:
@@ -148,86 +377,93 @@ def get_grant_json_data(grant_id):
             logger.warning(f"JSON endpoint returned status {response.status_code}")
             return None
     except Exception as e:
+        CIRCUIT_BREAKER.record("grantsws", False)
         logger.error(f"Error fetching JSON data: {str(e)}")
         return None
 
 def get_grant_details_from_web(opportunity_id, max_retries=3):
     """Scrape grant details from Grants.gov website with retry and dynamic URL selection"""
-    # Multiple possible URL formats to try
-    url_formats = [
-        f"https://www.grants.gov/search-results-detail/{opportunity_id}",
-        f"https://www.grants.gov/search-grants/view-grant.html?oppId={opportunity_id}",
-        f"https://www.grants.gov/web/grants/view-opportunity.html?oppId={opportunity_id}"  # Add older URL format
-    ]
-    
-    # Set up request headers to mimic a browser
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
-    
     grant_data = {}
     
-    for url in url_formats:
-        for retry in range(max_retries):
-            try:
-                logger.info(f"Trying URL: {url} (attempt {retry+1})")
-                # Add jitter between requests
-                delay = 2 + (retry * 1.5) + random.uniform(0.5, 2.0)
-                time.sleep(delay)
-                
-                response = requests.get(url, headers=headers, timeout=30)
-                
-                if response.status_code == 200:
-                    logger.info(f"Successfully fetched page for grant {opportunity_id}")
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Save first successful HTML for detailed analysis
-                    if retry == 0:
-                        with open(f"grant_{opportunity_id}_debug.html", "w") as f:
-                            f.write(str(soup))
-                        logger.info(f"Saved HTML to grant_{opportunity_id}_debug.html for debugging")
-                    
-                    # Try all extraction methods in sequence and combine results
-                    # First look for embedded JSON (most reliable if available)
-                    json_data = extract_embedded_json(soup)
-                    if json_data:
-                        grant_data.update(json_data)
-                    
-                    # Then try structured data
-                    data = extract_from_tables(soup)
-                    grant_data.update(data)
-                    
-                    # Try section-based extraction
-                    section_data = extract_from_sections(soup)
-                    grant_data.update(section_data)
-                    
-                    # Finally try text-based extraction
-                    text_data = extract_from_text(soup)
-                    grant_data.update(text_data)
-                    
-                    if data_has_required_fields(grant_data):
-                        logger.info(f"Successfully extracted required data for grant {opportunity_id}: {grant_data}")
-                        return grant_data
-                    
-                    # Save what we found and continue to the next URL
-                    logger.info(f"Found partial data: {grant_data}, trying next URL")
+    # Reuse a recent successful extraction instead of scraping again
+    cached_data = get_cached_response(f"grant:{opportunity_id}")
+    if cached_data is not None:
+        logger.info(f"Using cached scrape results for grant {opportunity_id}: {cached_data}")
+        return cached_data
+    
+    for url_template in WEB_URL_TEMPLATES:
+        url = url_template.format(opportunity_id=opportunity_id)
+        content = get_cached_response(url)
+        if content is not None:
+            logger.info(f"Using cached page for URL: {url}")
+        else:
+            for retry in range(max_retries):
+                # Skip URL formats that keep failing
+                if not CIRCUIT_BREAKER.allow(url_template):
+                    logger.info(f"Skipping URL {url}: circuit open")
                     break
+                
+                try:
+                    logger.info(f"Trying URL: {url} (attempt {retry+1})")
+                    # Wait for a slot in the per-host rate limit
+                    WEB_BUCKET.acquire()
                     
-                elif response.status_code in (403, 429):
-                    # Rate limited, back off with exponential delay
-                    backoff_time = (2 ** retry) + random.uniform(1, 3)
-                    logger.warning(f"Rate limited (status {response.status_code}). Retrying in {backoff_time:.2f} seconds...")
-                    time.sleep(backoff_time)
-                else:
-                    logger.warning(f"Failed to fetch page for URL {url}: status {response.status_code}")
-                    break  # Try next URL
+                    response = SESSION.get(url, headers=HTML_HEADERS, timeout=30, stream=True)
+                    CIRCUIT_BREAKER.record(url_template, response.status_code == 200)
                     
-            except Exception as e:
-                logger.error(f"Error fetching grant {opportunity_id} from URL {url}: {str(e)}")
-                logger.debug(traceback.format_exc())
-                # Continue to next attempt or URL
+                    if response.status_code == 200:
+                        logger.info(f"Successfully fetched page for grant {opportunity_id}")
+                        content = read_page_body(response)
+                        save_cached_response(url, content)
+                        
+                        # Save the raw page for detailed analysis when debugging
+                        if logger.isEnabledFor(logging.DEBUG):
+                            with open(f"grant_{opportunity_id}_debug.html", "wb") as f:
+                                f.write(content)
+                            logger.debug(f"Saved HTML to grant_{opportunity_id}_debug.html for debugging")
+                        break
+                        
+                    elif response.status_code in (403, 429):
+                        response.close()
+                        # Rate limited, back off with exponential delay
+                        backoff_time = get_backoff_time(retry, response)
+                        logger.warning(f"Rate limited (status {response.status_code}). Retrying in {backoff_time:.2f} seconds...")
+                        WEB_BUCKET.pause(backoff_time)
+                    else:
+                        response.close()
+                        logger.warning(f"Failed to fetch page for URL {url}: status {response.status_code}")
+                        break  # Try next URL
+                        
+                except Exception as e:
+                    CIRCUIT_BREAKER.record(url_template, False)
+                    logger.error(f"Error fetching grant {opportunity_id} from URL {url}: {str(e)}")
+                    logger.debug(traceback.format_exc())
+                    # Continue to next attempt or URL
+        
+        if content is None:
+            continue
+        
+        # Error pages, interstitials and redirects carry no award data - skip building a tree for them
+        if not AWARD_HINT_RE.search(content):
+            logger.info(f"No award information on page {url}, trying next URL")
+            continue
+        
+        try:
+            # Try all extraction methods and combine results
+            tree = lxml.html.document_fromstring(content)
+            grant_data.update(extract_all(tree))
+        except Exception as e:
+            logger.error(f"Error extracting grant {opportunity_id} from URL {url}: {str(e)}")
+            logger.debug(traceback.format_exc())
+            continue
+        
+        if data_has_required_fields(grant_data):
+            logger.info(f"Successfully extracted required data for grant {opportunity_id}: {grant_data}")
+            save_cached_response(f"grant:{opportunity_id}", grant_data)
+            return grant_data
+        
+        # Save what we found and continue to the next URL
+        logger.info(f"Found partial data: {grant_data}, trying next URL")
     
     # If we got here, we might have partial data but not all required fields
     if grant_data:
@@ -236,141 +472,203 @@ def get_grant_details_from_web(opportunity_id, max_retries=3):
     # Check if we have at least something useful    
     return grant_data
 
+# Award fields the page extractors are expected to find
+REQUIRED_FIELDS = ('awardCeiling', 'awardFloor', 'expectedNumOfAwards')
+
 def data_has_required_fields(data):
     """Check if we have the most important fields"""
-    required_fields = ['awardCeiling', 'awardFloor', 'expectedNumOfAwards']
-    return any(field in data for field in required_fields)
+    return any(field in data for field in REQUIRED_FIELDS)
+
+def data_has_all_required_fields(data):
+    """Check if every one of the most important fields has been found"""
+    return all(field in data for field in REQUIRED_FIELDS)
+
+def has_class_keyword(tag, keywords):
+    """Check whether any of the tag's CSS classes contains one of the keywords"""
+    return any(keyword in css_class.lower() for css_class in (tag.get('class') or '').split() for keyword in keywords)
+
+def element_string(element):
+    """Return an element's only piece of text, or None if it has mixed content (like BeautifulSoup's Tag.string)"""
+    while len(element):
+        if len(element) > 1 or element.text or element[0].tail:
+            return None
+        element = element[0]
+    return element.text
 
-def extract_from_tables(soup):
+def index_page(tree):
+    """Walk the parse tree once and bucket the tags each extractor needs"""
+    page = {
+        'tables': [],
+        'award_sections': [],
+        'key_divs': [],
+        'award_spans': [],
+        'json_scripts': [],
+        'js_scripts': [],
+    }
+    
+    for tag in tree.iter(*PAGE_TAGS):
+        name = tag.tag
+        if name == 'table':
+            page['tables'].append(tag)
+        elif name in ('section', 'div'):
+            if has_class_keyword(tag, ('award', 'funding')):
+                page['award_sections'].append(tag)
+            if name == 'div' and has_class_keyword(tag, ('detail', 'info')):
+                page['key_divs'].append(tag)
+        elif name == 'span':
+            text = element_string(tag)
+            if text and ('award ceiling' in text.lower() or 'award floor' in text.lower()):
+                page['award_spans'].append(tag)
+        elif name == 'script':
+            script_type = tag.get('type')
+            if script_type == 'application/json':
+                page['json_scripts'].append(tag)
+            elif script_type == 'text/javascript':
+                page['js_scripts'].append(tag)
+    
+    return page
+
+def extract_all(tree):
+    """Run the extractors over a single walk of the page, stopping early only once every required field is found"""
+    page = index_page(tree)
+    
+    data = {}
+    # Embedded JSON first, then tables, sections and finally the full-text sweep - later sources override earlier ones
+    for extractor in (extract_embedded_json, extract_from_tables, extract_from_sections):
+        data.update(extractor(page))
+        if data_has_all_required_fields(data):
+            return data
+    
+    data.update(extract_from_text(tree))
+    return data
+
+def extract_from_tables(page):
     """Extract grant data from tables in the page"""
     data = {}
     
-    # Find all tables
-    tables = soup.find_all('table')
-    for table in tables:
-        rows = table.find_all('tr')
-        for row in rows:
-            cells = row.find_all(['td', 'th'])
+    for table in page['tables']:
+        for row in table.iter('tr'):
+            cells = list(row.iter('td', 'th'))
             if len(cells) >= 2:
-                label = cells[0].get_text().strip()
-                value = cells[1].get_text().strip()
+                label = cells[0].text_content().strip()
+                value = cells[1].text_content().strip()
                 
                 logger.debug(f"Found table cell: {label} = {value}")
                 
                 # Map to our field names - use more flexible matching
-                if any(keyword in label.lower() for keyword in ["award ceiling", "ceiling", "max award"]):
-                    value = re.sub(r'[^\d.]', '', value)
-                    if value:
-                        data['awardCeiling'] = value
-                        logger.info(f"Extracted award ceiling: {value}")
-                elif any(keyword in label.lower() for keyword in ["award floor", "floor", "min award"]):
-                    value = re.sub(r'[^\d.]', '', value)
-                    if value:
-                        data['awardFloor'] = value
-                        logger.info(f"Extracted award floor: {value}")
-                elif any(keyword in label.lower() for keyword in ["expected number of awards", "num awards", "number of awards"]):
-                    value = re.sub(r'[^\d]', '', value)
-                    if value:
-                        data['expectedNumOfAwards'] = value
-                        logger.info(f"Extracted expected awards: {value}")
+                match = TABLE_LABEL_RE.match(label)
+                if not match:
+                    continue
+                
+                field, cleaner, description = TABLE_LABEL_FIELDS[match.lastgroup]
+                value = cleaner.sub('', value)
+                if value:
+                    data[field] = value
+                    logger.info(f"Extracted {description}: {value}")
     
     return data
 
-def extract_from_sections(soup):
+def extract_from_sections(page):
     """Extract grant data from specific sections or divs"""
     data = {}
     
-    # Find grant ID for debugging
-    grant_id = soup.find('input', {'id': 'oppId'})
-    if not grant_id:
-        # Try other methods to get grant ID
-        url_meta = soup.find('meta', {'property': 'og:url'})
-        if url_meta:
-            url = url_meta.get('content', '')
-            grant_id = url.split('/')[-1] if url else 'unknown'
-        else:
-            grant_id = 'unknown'
-    else:
-        grant_id = grant_id.get('value', 'unknown')
-    
     # Look for these specific sections on grants.gov
     # 1. Award Information section
-    award_sections = soup.find_all(['section', 'div'], class_=lambda c: c and ('award' in c.lower() or 'funding' in c.lower()))
-    for section in award_sections:
-        section_text = section.get_text()
+    for section in page['award_sections']:
+        section_text = section.text_content()
         logger.debug(f"Found potential award section: {section_text[:100]}...")
         
         # Look for award ceiling
-        ceiling_match = re.search(r'Award Ceiling:?\s*\$?([0-9,\.]+)', section_text, re.IGNORECASE)
+        ceiling_match = SECTION_CEILING_RE.search(section_text)
         if ceiling_match:
             data['awardCeiling'] = ceiling_match.group(1).replace(',', '')
             logger.info(f"Extracted award ceiling: {data['awardCeiling']}")
             
         # Look for award floor
-        floor_match = re.search(r'Award Floor:?\s*\$?([0-9,\.]+)', section_text, re.IGNORECASE)
+        floor_match = SECTION_FLOOR_RE.search(section_text)
         if floor_match:
             data['awardFloor'] = floor_match.group(1).replace(',', '')
             logger.info(f"Extracted award floor: {data['awardFloor']}")
             
         # Look for expected number of awards
-        awards_match = re.search(r'Expected Number of Awards:?\s*([0-9,]+)', section_text, re.IGNORECASE)
+        awards_match = SECTION_AWARDS_RE.search(section_text)
         if awards_match:
             data['expectedNumOfAwards'] = awards_match.group(1).replace(',', '')
             logger.info(f"Extracted expected awards: {data['expectedNumOfAwards']}")
             
     # 2. Look for specific divs containing award info
-    key_divs = soup.find_all('div', class_=lambda c: c and ('detail' in c.lower() or 'info' in c.lower()))
-    for div in key_divs:
-        div_text = div.get_text().strip()
+    for div in page['key_divs']:
+        div_text = div.text_content().strip()
         
         # Look for common patterns
         if 'award ceiling' in div_text.lower():
             # Try to find value in a nearby element
-            ceiling_value = re.search(r'\$?([0-9,\.]+)', div_text.split('award ceiling', 1)[1], re.IGNORECASE)
+            ceiling_value = AMOUNT_RE.search(div_text.split('award ceiling', 1)[1])
             if ceiling_value:
                 data['awardCeiling'] = ceiling_value.group(1).replace(',', '')
                 logger.info(f"Extracted award ceiling from div: {data['awardCeiling']}")
         
         if 'award floor' in div_text.lower():
             # Try to find value in a nearby element
-            floor_value = re.search(r'\$?([0-9,\.]+)', div_text.split('award floor', 1)[1], re.IGNORECASE)
+            floor_value = AMOUNT_RE.search(div_text.split('award floor', 1)[1])
             if floor_value:
                 data['awardFloor'] = floor_value.group(1).replace(',', '')
                 logger.info(f"Extracted award floor from div: {data['awardFloor']}")
     
     # 3. Look for any spans with award info
-    award_spans = soup.find_all('span', string=lambda s: s and ('award ceiling' in s.lower() or 'award floor' in s.lower()))
-    for span in award_spans:
-        next_sibling = span.next_sibling
-        if next_sibling:
-            text = next_sibling.get_text() if hasattr(next_sibling, 'get_text') else str(next_sibling)
-            value_match = re.search(r'\$?([0-9,\.]+)', text)
+    for span in page['award_spans']:
+        # The value is either the text right after the span or the next element
+        next_element = span.getnext()
+        text = span.tail or (next_element.text_content() if next_element is not None else None)
+        if text:
+            value_match = AMOUNT_RE.search(text)
             if value_match:
-                if 'ceiling' in span.get_text().lower():
+                if 'ceiling' in span.text_content().lower():
                     data['awardCeiling'] = value_match.group(1).replace(',', '')
                     logger.info(f"Extracted award ceiling from span: {data['awardCeiling']}")
-                elif 'floor' in span.get_text().lower():
+                elif 'floor' in span.text_content().lower():
                     data['awardFloor'] = value_match.group(1).replace(',', '')
                     logger.info(f"Extracted award floor from span: {data['awardFloor']}")
     
-    # Save the HTML for detailed analysis
-    with open(f"grant_{grant_id}_debug.html", "w") as f:
-        f.write(str(soup))
+    return data
+
+def search_json(json_data):
+    """Walk nested JSON depth-first in document order and collect award values; later matches win"""
+    results = {}
+    stack = [iter(json_data.items())]
     
-    logger.info(f"Saved HTML to grant_{grant_id}_debug.html for debugging")
+    while stack:
+        for key, value in stack[-1]:
+            key_lower = key.lower() if isinstance(key, str) else ""
+            
+            # Check if this key contains award data
+            if isinstance(value, (int, float, str)) and key_lower:
+                if any(keyword in key_lower for keyword in CEILING_KEYS):
+                    results["awardCeiling"] = value
+                elif any(keyword in key_lower for keyword in FLOOR_KEYS):
+                    results["awardFloor"] = value
+                elif "expected" in key_lower and "award" in key_lower:
+                    results["expectedNumOfAwards"] = value
+            
+            # Descend into nested objects before moving on to the next key
+            if isinstance(value, dict):
+                stack.append(iter(value.items()))
+                break
+            if isinstance(value, list):
+                stack.append((None, item) for item in value)
+                break
+        else:
+            stack.pop()
     
-    return data
+    return results
 
-def extract_embedded_json(soup):
+def extract_embedded_json(page):
     """Extract grant data from any embedded JSON in the page"""
     data = {}
     
     # Look for JSON data in script tags
-    scripts = soup.find_all('script', {'type': 'application/json'})
-    scripts.extend(soup.find_all('script', {'type': 'text/javascript'}))
-    
-    for script in scripts:
-        script_text = script.string
+    for script in page['json_scripts'] + page['js_scripts']:
+        script_text = script.text
         if not script_text:
             continue
             
@@ -381,40 +679,17 @@ def extract_embedded_json(soup):
             if json_start >= 0 and json_end > json_start:
                 json_text = script_text[json_start:json_end]
                 
+                # Only parse blobs that could contain an award key at all
+                if not AWARD_KEY_HINT_RE.search(json_text):
+                    continue
+                
                 # Try to parse as JSON
                 try:
                     json_data = json.loads(json_text)
                     
                     # Look for grant data in the JSON
                     if isinstance(json_data, dict):
-                        # Search recursively for award ceiling/floor/etc
-                        def search_json(obj, path=""):
-                            results = {}
-                            if isinstance(obj, dict):
-                                for key, value in obj.items():
-                                    key_lower = key.lower() if isinstance(key, str) else ""
-                                    
-                                    # Check if this key contains award data
-                                    if isinstance(value, (int, float, str)) and key_lower:
-                                        if "ceiling" in key_lower or "maximum" in key_lower:
-                                            results["awardCeiling"] = value
-                                        elif "floor" in key_lower or "minimum" in key_lower:
-                                            results["awardFloor"] = value
-                                        elif "expected" in key_lower and "award" in key_lower:
-                                            results["expectedNumOfAwards"] = value
-                                    
-                                    # Recursively search nested objects
-                                    if isinstance(value, (dict, list)):
-                                        nested_results = search_json(value, f"{path}.{key}" if path else key)
-                                        results.update(nested_results)
-                            elif isinstance(obj, list):
-                                for i, item in enumerate(obj):
-                                    nested_results = search_json(item, f"{path}[{i}]")
-                                    results.update(nested_results)
-                            return results
-                        
-                        found_data = search_json(json_data)
-                        data.update(found_data)
+                        data.update(search_json(json_data))
                 except json.JSONDecodeError:
                     pass
         except Exception as e:
@@ -425,76 +700,16 @@ def extract_embedded_json(soup):
     
     return data
 
-def extract_from_text(soup):
-    """Extract grant data from any text in the page using more aggressive pattern matching"""
+def extract_from_text(tree):
+    """Extract grant data from the page text with a single sweep for award labels and their amounts"""
     data = {}
-    text = soup.get_text()
-    
-    # Try to extract dollar amounts that appear after specific keywords
-    lines = text.split('\n')
-    for i, line in enumerate(lines):
-        line = line.strip()
-        
-        # Look for award ceiling
-        if 'award ceiling' in line.lower():
-            # Check this line and next few lines for dollar amounts
-            for j in range(i, min(i+5, len(lines))):
-                ceiling_match = re.search(r'\$?\s*([0-9,\.]+)', lines[j])
-                if ceiling_match:
-                    data['awardCeiling'] = ceiling_match.group(1).replace(',', '')
-                    logger.info(f"Extracted award ceiling from line {j-i}: {data['awardCeiling']}")
-                    break
-        
-        # Look for award floor
-        if 'award floor' in line.lower():
-            # Check this line and next few lines for dollar amounts
-            for j in range(i, min(i+5, len(lines))):
-                floor_match = re.search(r'\$?\s*([0-9,\.]+)', lines[j])
-                if floor_match:
-                    data['awardFloor'] = floor_match.group(1).replace(',', '')
-                    logger.info(f"Extracted award floor from line {j-i}: {data['awardFloor']}")
-                    break
-                    
-        # Look for expected awards
-        if 'expected number of awards' in line.lower():
-            # Check this line and next few lines for numbers
-            for j in range(i, min(i+5, len(lines))):
-                awards_match = re.search(r'([0-9,\.]+)', lines[j])
-                if awards_match:
-                    data['expectedNumOfAwards'] = awards_match.group(1).replace(',', '')
-                    logger.info(f"Extracted expected awards from line {j-i}: {data['expectedNumOfAwards']}")
-                    break
-    
-    # More aggressive pattern matching approach for the entire text
-    all_text = ' '.join(lines)
-    
-    # Try to find patterns with broader context
-    ceiling_contexts = [
-        r'award ceiling.*?\$([0-9,\.]+)',
-        r'ceiling.*?\$([0-9,\.]+)',
-        r'maximum award.*?\$([0-9,\.]+)',
-        r'up to.*?\$([0-9,\.]+)'
-    ]
     
-    for pattern in ceiling_contexts:
-        match = re.search(pattern, all_text, re.IGNORECASE)
-        if match and 'awardCeiling' not in data:
-            data['awardCeiling'] = match.group(1).replace(',', '')
-            logger.info(f"Extracted award ceiling with pattern: {data['awardCeiling']}")
-            break
-    
-    floor_contexts = [
-        r'award floor.*?\$([0-9,\.]+)',
-        r'floor.*?\$([0-9,\.]+)',
-        r'minimum award.*?\$([0-9,\.]+)'
-    ]
-    
-    for pattern in floor_contexts:
-        match = re.search(pattern, all_text, re.IGNORECASE)
-        if match and 'awardFloor' not in data:
-            data['awardFloor'] = match.group(1).replace(',', '')
-            logger.info(f"Extracted award floor with pattern: {data['awardFloor']}")
-            break
+    for match in TEXT_AMOUNT_RE.finditer(''.join(VISIBLE_TEXT_XPATH(tree))):
+        field = TEXT_AMOUNT_FIELDS[match.group('kind').lower()]
+        # The first amount found for each field wins
+        if field not in data:
+            data[field] = match.group('value').replace(',', '')
+            logger.info(f"Extracted {field} from text: {data[field]}")
     
     return data
 
@@ -506,29 +721,34 @@ def get_api_grant_details(grant_id, max_retries=3):
         "https://api.grants.gov/v1/api/search2"  # For POST requests
     ]
     
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Safari/605.1.15"
-    }
+    # Reuse a recent API result for this grant
+    cached_data = get_cached_response(f"api:{grant_id}")
+    if cached_data is not None:
+        logger.info(f"Using cached API results for grant {grant_id}")
+        return cached_data
     
     # First try fetchOpportunity endpoint (GET)
     for retry in range(max_retries):
+        if not CIRCUIT_BREAKER.allow("fetchOpportunity"):
+            logger.info("Skipping fetchOpportunity API: circuit open")
+            break
+        
         try:
-            # Add jitter between requests
-            delay = 2 + (retry * 2) + random.uniform(1.0, 3.0)
-            time.sleep(delay)
+            # Wait for a slot in the per-host rate limit
+            API_BUCKET.acquire()
             
             logger.debug(f"Trying fetchOpportunity API for grant {grant_id} (attempt {retry+1})")
-            response = requests.get(endpoints[0], headers=headers, timeout=30)
+            response = SESSION.get(endpoints[0], headers=API_HEADERS, timeout=30)
+            CIRCUIT_BREAKER.record("fetchOpportunity", response.status_code == 200)
             
             if response.status_code in (403, 429):
-                backoff_time = (2 ** retry) + random.uniform(1, 3)
+                backoff_time = get_backoff_time(retry, response)
                 logger.warning(f"Rate limited (status {response.status_code}). Retrying in {backoff_time:.2f} seconds...")
-                time.sleep(backoff_time)
+                API_BUCKET.pause(backoff_time)
                 continue
             
             if response.status_code == 200:
-                data = response.json()
+                data = json.loads(response.content)
                 
                 # Check for error code
                 if data.get("errorcode", 0) != 0:
@@ -536,22 +756,28 @@ def get_api_grant_details(grant_id, max_retries=3):
                 else:
                     # Extract opportunity details
                     if "data" in data:
+                        save_cached_response(f"api:{grant_id}", data["data"])
                         return data["data"]
             
             logger.warning(f"fetchOpportunity API returned status {response.status_code}")
             break  # Try search API instead
             
         except Exception as e:
+            CIRCUIT_BREAKER.record("fetchOpportunity", False)
             logger.error(f"Error with fetchOpportunity API for grant {grant_id}: {str(e)}")
             if retry < max_retries - 1:
-                backoff_time = (2 ** retry) + random.uniform(1, 3)
+                backoff_time = get_backoff_time(retry)
                 logger.warning(f"Will retry in {backoff_time:.2f} seconds...")
-                time.sleep(backoff_time)
+                API_BUCKET.pause(backoff_time)
             else:
                 break  # Try search API instead
     
     # If fetchOpportunity failed, try the search API (POST)
     for retry in range(max_retries):
+        if not CIRCUIT_BREAKER.allow("search2"):
+            logger.info("Skipping search API: circuit open")
+            return None
+        
         try:
             # Construct a search payload using the opportunity ID
             payload = {
@@ -559,53 +785,103 @@ def get_api_grant_details(grant_id, max_retries=3):
                 "rows": 1
             }
             
-            # Add longer delay with jitter between requests
-            delay = 2 + (retry * 2) + random.uniform(1.0, 3.0)
-            logger.debug(f"Waiting {delay:.2f} seconds before search API call")
-            time.sleep(delay)
+            # Wait for a slot in the per-host rate limit
+            API_BUCKET.acquire()
             
             logger.debug(f"Trying search API for grant {grant_id} (attempt {retry+1})")
-            response = requests.post(endpoints[1], headers=headers, json=payload)
+            response = SESSION.post(endpoints[1], headers=API_HEADERS, json=payload, timeout=30)
+            CIRCUIT_BREAKER.record("search2", response.status_code == 200)
             
             if response.status_code in (403, 429):
                 if retry < max_retries - 1:
-                    backoff_time = (2 ** retry) + random.uniform(1, 3)
+                    backoff_time = get_backoff_time(retry, response)
                     logger.warning(f"Rate limited (status {response.status_code}). Retrying in {backoff_time:.2f} seconds...")
-                    time.sleep(backoff_time)
+                    API_BUCKET.pause(backoff_time)
                     continue
                 else:
                     logger.warning(f"API rate limit exceeded for search API after {max_retries} retries")
                     return None
             
             if response.status_code == 200:
-                data = response.json()
+                data = json.loads(response.content)
                 
                 if data.get("errorcode", 0) != 0:
                     logger.warning(f"Search API returned error for grant {grant_id}: {data.get('msg', 'Unknown error')}")
                     return None
                 
                 if "data" in data and "oppHits" in data["data"] and data["data"]["oppHits"]:
+                    save_cached_response(f"api:{grant_id}", data["data"]["oppHits"][0])
                     return data["data"]["oppHits"][0]
             
             logger.warning(f"Search API returned status {response.status_code} or no results")
             return None
             
         except Exception as e:
+            CIRCUIT_BREAKER.record("search2", False)
             logger.error(f"Error with search API for grant {grant_id}: {str(e)}")
             if retry < max_retries - 1:
-                backoff_time = (2 ** retry) + random.uniform(1, 3)
+                backoff_time = get_backoff_time(retry)
                 logger.warning(f"Will retry in {backoff_time:.2f} seconds...")
-                time.sleep(backoff_time)
+                API_BUCKET.pause(backoff_time)
             else:
                 return None
     
     return None
 
-def fix_grant(grant_id, table_client):
-    """Fix data issues for a specific grant"""
+def get_json_award_data(grant_id):
+    """Award fields from the grantsws JSON endpoint, in the same shape as the web scrape"""
+    data = get_grant_json_data(grant_id)
+    return search_json(data) if isinstance(data, dict) else None
+
+def get_api_award_data(grant_id):
+    """Award fields from the Grants.gov API, in the same shape as the web scrape"""
+    data = get_api_grant_details(grant_id)
+    if not isinstance(data, dict):
+        return None
+    
+    award_data = search_json(data)
+    if isinstance(data.get('fundingInstrument'), str):
+        award_data['fundingInstrument'] = data['fundingInstrument']
+    return award_data
+
+# Sources fix_grant tries in order until one yields award data
+GRANT_DATA_SOURCES = (
+    ("API", get_api_award_data),
+    ("JSON", get_json_award_data),
+    ("web", get_grant_details_from_web),
+)
+
+def get_award_updates(data, entity):
+    """Map award fields found by any data source onto entity updates"""
+    updates = {}
+    if not data:
+        return updates
+    
+    # Process any field we found - even partial data is better than none
+    if 'awardCeiling' in data:
+        ceiling_value = safe_float(data.get('awardCeiling'))
+        if ceiling_value > 0:
+            updates['AwardCeiling'] = ceiling_value
+    
+    if 'awardFloor' in data:
+        floor_value = safe_float(data.get('awardFloor'))
+        if floor_value >= 0:  # Floor can be 0
+            updates['AwardFloor'] = floor_value
+    
+    if 'expectedNumOfAwards' in data:
+        awards_value = safe_int(data.get('expectedNumOfAwards'))
+        updates['ExpectedNumberofAwards'] = awards_value
+        updates['ExpectedAwards'] = awards_value
+    
+    if 'fundingInstrument' in data and not entity.get('FundingType'):
+        updates['FundingType'] = data.get('fundingInstrument')
+    
+    return updates
+
+def fix_grant(entity):
+    """Work out the fixes for a grant entity. Returns the merge entity to write, or None if nothing changed"""
+    grant_id = entity['RowKey']
     try:
-        # Get the grant entity from Azure
-        entity = table_client.get_entity("Grant", grant_id)
         logger.info(f"Processing grant {grant_id}")
         
         updates = {}
@@ -629,70 +905,19 @@ def fix_grant(grant_id, table_client):
             updates['ExpectedAwards'] = entity.get('ExpectedNumberofAwards')
             modified = True
         
-        # If any critical fields missing, try all data sources
+        # If any critical fields missing, try the data sources from cheapest to most expensive:
+        # the JSON API, then the grantsws JSON endpoint, and only then the HTML scrape
         if needs_fix:
             logger.info(f"Attempting to fix missing values for grant {grant_id}")
             
-            # Try web scraping first (more reliable)
-            web_data = get_grant_details_from_web(grant_id)
-            
-            if web_data:
-                # Process any field we found - even partial data is better than none
-                if 'awardCeiling' in web_data:
-                    ceiling_value = safe_float(web_data.get('awardCeiling'))
-                    if ceiling_value > 0:
-                        updates['AwardCeiling'] = ceiling_value
-                        modified = True
-                        logger.info(f"Setting AwardCeiling to {ceiling_value}")
-                
-                if 'awardFloor' in web_data:
-                    floor_value = safe_float(web_data.get('awardFloor'))
-                    if floor_value >= 0:  # Floor can be 0
-                        updates['AwardFloor'] = floor_value
-                        modified = True
-                        logger.info(f"Setting AwardFloor to {floor_value}")
-                
-                if 'expectedNumOfAwards' in web_data:
-                    awards_value = safe_int(web_data.get('expectedNumOfAwards'))
-                    updates['ExpectedNumberofAwards'] = awards_value
-                    updates['ExpectedAwards'] = awards_value
-                    modified = True
-                    logger.info(f"Setting ExpectedNumberofAwards to {awards_value}")
-                    
-                if 'fundingInstrument' in web_data and not entity.get('FundingType'):
-                    updates['FundingType'] = web_data.get('fundingInstrument')
+            for source, get_data in GRANT_DATA_SOURCES:
+                source_updates = get_award_updates(get_data(grant_id), entity)
+                if source_updates:
+                    logger.info(f"Using {source} data for grant {grant_id}")
+                    updates.update(source_updates)
                     modified = True
-                    logger.info(f"Setting FundingType to {web_data.get('fundingInstrument')}")
-                
-                # Only try API if web scraping got nothing useful
-                if not modified:
-                    logger.info(f"Web scraping failed for grant {grant_id}, trying API as fallback")
-                    api_data = get_api_grant_details(grant_id)
-                    
-                    if api_data:
-                        # Process API data 
-                        # (existing code to process API data)
-                        if api_data.get('awardCeiling'):
-                            ceiling_value = safe_float(api_data.get('awardCeiling'))
-                            if ceiling_value > 0:
-                                updates['AwardCeiling'] = ceiling_value
-                                modified = True
-                        
-                        if api_data.get('awardFloor'):
-                            floor_value = safe_float(api_data.get('awardFloor'))
-                            if floor_value >= 0:  # Floor can be 0
-                                updates['AwardFloor'] = floor_value
-                                modified = True
-                        
-                        # Other API data processing
-                        # ...
-            else:
-                # Web scraping completely failed, try API as fallback
-                logger.info(f"Web scraping failed for grant {grant_id}, trying API as fallback")
-                api_data = get_api_grant_details(grant_id)
-                
-                # Process API data as before
-                # ...
+                    break
+                logger.info(f"No usable {source} data for grant {grant_id}, trying next source")
         
         # Ensure AwardFloor <= AwardCeiling
         if 'AwardFloor' in updates and 'AwardCeiling' in updates:
@@ -721,22 +946,66 @@ def fix_grant(grant_id, table_client):
             updates['LastFixed'] = datetime.now().isoformat()
             updates['PartitionKey'] = entity['PartitionKey']
             updates['RowKey'] = entity['RowKey']
-            
-            try:
-                table_client.update_entity(mode=UpdateMode.MERGE, entity=updates)
-                logger.info(f"Updated grant {grant_id} with fixes: {updates}")
-                return True
-            except Exception as e:
-                logger.error(f"Error updating grant {grant_id}: {str(e)}")
-                return False
+            # The full update is only worth formatting when debugging; main logs one line per written batch
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Fixes for grant {grant_id}: {updates}")
+            return updates
         else:
             logger.info(f"No fixes needed or found for grant {grant_id}")
-            return False
+            return None
             
     except Exception as e:
         logger.error(f"Error processing grant {grant_id}: {str(e)}")
         logger.debug(traceback.format_exc())
-        return False
+        return None
+
+def update_entities(table_client, entities):
+    """Merge a batch of grant fixes in one transaction, falling back to one call per entity.
+    Returns the number of grants updated."""
+    updated = 0
+    retry_individually = []
+    while entities:
+        try:
+            table_client.submit_transaction([("update", entity, {"mode": UpdateMode.MERGE}) for entity in entities])
+            logger.info(f"Updated {len(entities)} grants in one transaction")
+            updated += len(entities)
+            break
+        except TableTransactionError as e:
+            # The whole transaction was rolled back because of one operation (index 0 when the service
+            # doesn't say which) - set it aside for a single retry and resubmit the rest
+            index = e.index if e.index is not None and 0 <= e.index < len(entities) else 0
+            logger.warning(f"Batch update failed on grant {entities[index]['RowKey']}, resubmitting the rest: {str(e)}")
+            retry_individually.append(entities[index])
+            entities = entities[:index] + entities[index + 1:]
+        except Exception as e:
+            logger.warning(f"Batch update of {len(entities)} grants failed, retrying individually: {str(e)}")
+            retry_individually.extend(entities)
+            break
+    
+    for entity in retry_individually:
+        try:
+            table_client.update_entity(mode=UpdateMode.MERGE, entity=entity)
+            updated += 1
+        except Exception as e:
+            logger.error(f"Error updating grant {entity['RowKey']}: {str(e)}")
+    return updated
+
+def get_grant_entities(table_client, grant_ids):
+    """Fetch the fields fix_grant needs for specific grants, a chunk of RowKeys per query"""
+    entities = []
+    for start in range(0, len(grant_ids), ROWKEY_FILTER_CHUNK):
+        chunk = grant_ids[start:start + ROWKEY_FILTER_CHUNK]
+        rowkey_filter = " or ".join("RowKey eq '{}'".format(grant_id.replace("'", "''")) for grant_id in chunk)
+        try:
+            entities.extend(table_client.query_entities(f"PartitionKey eq 'Grant' and ({rowkey_filter})", select=FIX_FIELDS))
+        except Exception as e:
+            logger.error(f"Error fetching grants {', '.join(chunk)}: {str(e)}")
+    
+    found = {entity['RowKey'] for entity in entities}
+    for grant_id in grant_ids:
+        if grant_id not in found:
+            logger.error(f"Grant {grant_id} not found")
+    return entities
 
 def main():
     """Fix data issues for grants with missing values"""
@@ -752,81 +1021,72 @@ def main():
         table_client = table_service.get_table_client("GrantDetails")
         
         # Get grants to fix - either from command line arguments or from query
-        grant_ids = []
+        entities = []
         
         # Check if grant IDs are provided as command line arguments
         if len(sys.argv) > 1:
-            grant_ids = sys.argv[1:]
+            # Drop repeated IDs (keeping order) so no grant is fetched or fixed twice
+            grant_ids = list(dict.fromkeys(sys.argv[1:]))
             logger.info(f"Processing {len(grant_ids)} grants from command line arguments")
+            entities = get_grant_entities(table_client, grant_ids)
         else:
             # Query for grants with missing data
             logger.info("Fetching grants with missing data from Azure Table...")
             
-            # First, try a simpler query to verify connection
+            # First, try a simpler query to verify connection - one page is enough
             logger.info("Testing connection with simple query...")
-            test_grants = list(table_client.query_entities("PartitionKey eq 'Grant'", results_per_page=5))
+            test_grants = list(islice(table_client.query_entities("PartitionKey eq 'Grant'", select=["RowKey"], results_per_page=5), 5))
             logger.info(f"Connection test successful, found {len(test_grants)} grants")
             
-            # Now query for grants with missing data - breaking it into separate queries
-            # 1. Get grants with missing award ceiling
-            ceiling_grants = list(table_client.query_entities("PartitionKey eq 'Grant' and AwardCeiling eq 0"))
-            logger.info(f"Found {len(ceiling_grants)} grants with AwardCeiling = 0")
-            
-            # 2. Get grants with missing award floor
-            floor_grants = list(table_client.query_entities("PartitionKey eq 'Grant' and AwardFloor eq 0"))
-            logger.info(f"Found {len(floor_grants)} grants with AwardFloor = 0")
-            
-            # 3. Combine the results (removing duplicates)
-            grants_dict = {}
-            for grant in ceiling_grants + floor_grants:
-                grants_dict[grant['RowKey']] = grant
-            
-            grant_ids = list(grants_dict.keys())
-            total_grants = len(grant_ids)
+            # Grants missing either award amount, in one scan - each row comes back once, so no de-duplication needed
+            entities = list(table_client.query_entities(
+                "PartitionKey eq 'Grant' and (AwardCeiling eq 0 or AwardFloor eq 0)",
+                select=FIX_FIELDS,
+                results_per_page=1000
+            ))
+            total_grants = len(entities)
             logger.info(f"Found {total_grants} unique grants with missing data to fix")
             
             # If there are too many grants to fix, limit to a reasonable number
             if total_grants > 100:
                 logger.info(f"Limiting to first 25 grants out of {total_grants} to avoid rate limits")
-                grant_ids = grant_ids[:25]
+                entities = entities[:25]
                 total_grants = 25
             
         # Track stats
         fixed_count = 0
         error_count = 0
         
-        # Process grants in small batches to avoid overwhelming the API
-        batch_size = 3  # Process just 3 grants at a time
-        total_grants = len(grant_ids)
+        # Fix grants concurrently - each one spends most of its time waiting on the network,
+        # so a small worker pool overlaps those waits without overwhelming the API
+        # Fixes are written back in transaction-sized batches
+        total_grants = len(entities)
+        batch = []
         
-        for batch_start in range(0, total_grants, batch_size):
-            batch_end = min(batch_start + batch_size, total_grants)
-            logger.info(f"Processing batch of grants {batch_start+1}-{batch_end} of {total_grants}")
+        with ThreadPoolExecutor(max_workers=FIX_WORKERS) as executor:
+            future_to_id = {executor.submit(fix_grant, entity): entity['RowKey'] for entity in entities}
             
-            # Process each grant in the current batch
-            for i in range(batch_start, batch_end):
-                grant_id = grant_ids[i]
+            for processed, future in enumerate(as_completed(future_to_id), start=1):
+                grant_id = future_to_id[future]
                 try:
-                    if fix_grant(grant_id, table_client):
-                        fixed_count += 1
-                    
-                    # Progress update
-                    if (i + 1) % batch_size == 0 or i + 1 == total_grants:
-                        logger.info(f"Progress: {i+1}/{total_grants} grants processed, {fixed_count} fixed, {error_count} errors")
-                    
-                    # Add a pause between individual grants
-                    if i < batch_end - 1:  # If not the last grant in batch
-                        time.sleep(random.uniform(2, 4))
-                        
+                    updates = future.result()
+                    if updates:
+                        batch.append(updates)
                 except Exception as e:
                     error_count += 1
                     logger.error(f"Error processing grant {grant_id}: {str(e)}")
-            
-            # Longer pause between batches
-            if batch_end < total_grants:
-                pause = random.uniform(20, 30)  # 20-30 second pause between batches
-                logger.info(f"Pausing for {pause:.2f} seconds before next batch...")
-                time.sleep(pause)
+                
+                if len(batch) == TRANSACTION_BATCH_SIZE:
+                    fixed_count += update_entities(table_client, batch)
+                    batch = []
+                
+                # Progress update
+                if processed % FIX_WORKERS == 0 or processed == total_grants:
+                    logger.info(f"Progress: {processed}/{total_grants} grants processed, {fixed_count} fixed, {error_count} errors")
+        
+        # Write the final partial batch
+        if batch:
+            fixed_count += update_entities(table_client, batch)
         
         logger.info(f"Completed grant data fixing. Total grants fixed: {fixed_count}, errors: {error_count}")
         
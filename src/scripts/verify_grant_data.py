@@ -1,138 +1,248 @@
 #!/usr/bin/env python3
 import os
+import sys
 import re
 import logging
 import requests
 import json
 import time
-from bs4 import BeautifulSoup
-from azure.data.tables import TableServiceClient, UpdateMode
+import shelve
+import threading
+import lxml.etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from azure.data.tables import TableServiceClient, TableTransactionError, UpdateMode
 from datetime import datetime
+from types import MappingProxyType
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Shared HTTP session so grants.gov connections (and their TLS handshakes) are reused across grants;
+# 429/5xx responses are retried with exponential backoff (honoring Retry-After) instead of failing the grant outright
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+))
+SESSION.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+})
+
+# Azure Table transactions hold at most 100 operations
+TRANSACTION_BATCH_SIZE = 100
+
+# Columns compared against grants.gov, with the value assumed when a grant doesn't have one
+VERIFY_COLUMNS = {
+    "AwardCeiling": 0,
+    "AwardFloor": 0,
+    "ExpectedAwards": 0,
+    "EstimatedTotalProgramFunding": 0,
+    "FundingType": "",
+    "Category": "",
+    "Description": "",
+}
+
+# Precompiled patterns for numeric cleanup and dollar amounts
+NON_FLOAT_RE = re.compile(r'[^0-9\.\-]')
+DOLLAR_RE = re.compile(r'\$\s*([\d,]+(?:\.\d+)?)')
+
+# Table header labels read from a grant page, and the API-style field each one fills
+GRANT_PAGE_FIELDS = MappingProxyType({
+    'Award Ceiling:': 'awardCeiling',
+    'Award Floor:': 'awardFloor',
+    'Expected Number of Awards:': 'expectedNumOfAwards',
+    'Funding Instrument Type:': 'fundingInstrumentType',
+    'Category of Funding Activity:': 'opportunityCategory',
+    'Estimated Total Program Funding:': 'estimatedTotalProgramFunding',
+})
+
+# On-disk cache of scraped grants, so reruns within a day don't hit grants.gov again
+GRANT_CACHE_FILE = "verify_grant_cache"
+GRANT_CACHE_TTL = 24 * 60 * 60
+grant_cache_lock = threading.Lock()
+
+# Grants verified at the same time; each one mostly waits on grants.gov and Azure
+VERIFY_WORKERS = 3
+
+def get_cached_grant(grant_id):
+    """Return the cache entry for a grant - its scrape results, fetch time and HTTP validators - or None"""
+    try:
+        with grant_cache_lock, shelve.open(GRANT_CACHE_FILE) as cache:
+            return cache.get(grant_id)
+    except Exception as e:
+        logger.debug(f"Could not read grant cache for {grant_id}: {str(e)}")
+        return None
+
+def save_cached_grant(grant_id, value, etag=None, last_modified=None):
+    """Store scrape results for a grant in the cache, with the page's ETag/Last-Modified for revalidation"""
+    try:
+        with grant_cache_lock, shelve.open(GRANT_CACHE_FILE) as cache:
+            cache[grant_id] = {"fetched_at": time.time(), "value": value, "etag": etag, "last_modified": last_modified}
+    except Exception as e:
+        logger.debug(f"Could not write grant cache for {grant_id}: {str(e)}")
+
+def read_grant_page(response):
+    """Stream a grant page through an incremental parser, collecting header label -> next cell text
+    (first occurrence wins) and the synopsis text. Stops reading once all GRANT_PAGE_FIELDS labels and the
+    synopsis have been seen, then releases the connection."""
+    parser = lxml.etree.HTMLPullParser(events=('end',))
+    rows = {}
+    description = None
+    pending_labels = []
+    
+    def handle_events():
+        nonlocal description, pending_labels
+        for _, element in parser.read_events():
+            if element.tag == 'th':
+                pending_labels.append(''.join(element.itertext()).strip())
+            elif element.tag == 'td' and pending_labels:
+                # The first cell after a header holds its value
+                value = ''.join(element.itertext()).strip()
+                for label in pending_labels:
+                    rows.setdefault(label, value)
+                pending_labels = []
+            elif element.tag == 'div' and description is None and 'synopsis-detail' in (element.get('class') or '').split():
+                description = ''.join(element.itertext()).strip()
+    
+    try:
+        for chunk in response.iter_content(chunk_size=16384):
+            parser.feed(chunk)
+            handle_events()
+            if description is not None and GRANT_PAGE_FIELDS.keys() <= rows.keys():
+                break
+        else:
+            parser.close()
+            handle_events()
+    finally:
+        # Anything left unread is discarded with the connection
+        response.close()
+    
+    return rows, description
+
 def get_grant_from_grants_gov(opportunity_id):
     """Fetch grant data directly from grants.gov website by scraping"""
+    cached_grant = get_cached_grant(opportunity_id)
+    # Pages that yielded nothing are never worth reusing (older runs may have cached some)
+    if cached_grant and not cached_grant["value"]["detailsResponse"]["opportunity"]:
+        cached_grant = None
+    if cached_grant and time.time() - cached_grant["fetched_at"] < GRANT_CACHE_TTL:
+        logger.info(f"Using cached data for grant {opportunity_id}")
+        return cached_grant["value"]
+    
     logger.info(f"Fetching grant {opportunity_id} from Grants.gov website...")
     
     url = f"https://www.grants.gov/search-results-detail/{opportunity_id}"
     
+    # An expired entry is revalidated, so an unchanged page costs a 304 instead of a download and parse
+    headers = {}
+    if cached_grant:
+        if cached_grant.get("etag"):
+            headers['If-None-Match'] = cached_grant["etag"]
+        if cached_grant.get("last_modified"):
+            headers['If-Modified-Since'] = cached_grant["last_modified"]
+    
     try:
         # First, let's try to get the page HTML
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
+        response = SESSION.get(url, headers=headers, timeout=30, stream=True)
+        
+        if response.status_code == 304 and cached_grant:
+            response.close()
+            logger.info(f"Grant {opportunity_id} unchanged on Grants.gov, using cached data")
+            save_cached_grant(
+                opportunity_id,
+                cached_grant["value"],
+                response.headers.get('ETag', cached_grant.get("etag")),
+                response.headers.get('Last-Modified', cached_grant.get("last_modified"))
+            )
+            return cached_grant["value"]
         
         if response.status_code == 200:
-            # Parse the HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # Parse the page as it streams in, stopping once every field has been found
+            rows, description = read_grant_page(response)
             
             # Now extract key information from the page
-            grant_data = {}
-            
-            # Get award amounts
-            award_ceiling_elem = soup.find('th', text='Award Ceiling:')
-            if award_ceiling_elem:
-                award_ceiling = award_ceiling_elem.find_next('td').get_text().strip()
-                grant_data['awardCeiling'] = award_ceiling
-            
-            award_floor_elem = soup.find('th', text='Award Floor:')
-            if award_floor_elem:
-                award_floor = award_floor_elem.find_next('td').get_text().strip()
-                grant_data['awardFloor'] = award_floor
-            
-            # Get expected number of awards
-            expected_awards_elem = soup.find('th', text='Expected Number of Awards:')
-            if expected_awards_elem:
-                expected_awards = expected_awards_elem.find_next('td').get_text().strip()
-                grant_data['expectedNumOfAwards'] = expected_awards
-            
-            # Get funding type
-            funding_type_elem = soup.find('th', text='Funding Instrument Type:')
-            if funding_type_elem:
-                funding_type = funding_type_elem.find_next('td').get_text().strip()
-                grant_data['fundingInstrumentType'] = funding_type
-            
-            # Get category
-            category_elem = soup.find('th', text='Category of Funding Activity:')
-            if category_elem:
-                category = category_elem.find_next('td').get_text().strip()
-                grant_data['opportunityCategory'] = category
+            grant_data = {field: rows[label] for label, field in GRANT_PAGE_FIELDS.items() if label in rows}
             
             # Get description - usually in the synopsis/details section
-            description_elem = soup.find('div', class_='synopsis-detail')
-            if description_elem:
-                description = description_elem.get_text().strip()
+            if description is not None:
                 grant_data['description'] = description
-                
-            # Get total estimated funding
-            total_funding_elem = soup.find('th', text='Estimated Total Program Funding:')
-            if total_funding_elem:
-                estimated_total = total_funding_elem.find_next('td').get_text().strip()
-                grant_data['estimatedTotalProgramFunding'] = estimated_total
             
             # Return a structure that mimics the API response structure
-            return {
+            result = {
                 "detailsResponse": {
                     "opportunity": grant_data
                 }
             }
+            # Only cache pages we could extract something from, so a broken or placeholder page is fetched again next time
+            if grant_data:
+                save_cached_grant(opportunity_id, result, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return result
             
         else:
+            response.close()
             logger.error(f"Failed to fetch grant {opportunity_id}: HTTP {response.status_code}")
             return None
     except Exception as e:
         logger.error(f"Error fetching grant {opportunity_id}: {str(e)}")
         return None
 
-def manual_grant_data(grant_id):
-    """Hard-coded data for specific grants based on screenshots"""
-    grants = {
-        "324456": {  # Expeditions in Computing - UPDATED with correct values from screenshot
-            "detailsResponse": {
-                "opportunity": {
-                    "awardCeiling": "5000000",  # $5,000,000 from screenshot
-                    "awardFloor": "15000000",   # $15,000,000 from screenshot - this seems odd as floor > ceiling
-                    "expectedNumOfAwards": "4",  # 4 from screenshot
-                    "fundingInstrumentType": "Grant", # Grant from screenshot
-                    "opportunityCategory": "Science and Technology and other Research and Development",
-                    "description": "The far-reaching impact and role of innovating in the computer and information science and engineering fields has been remarkable, generating economic prosperity and enhancing the quality of life for people throughout the world. More than a decade ago, the National Science Foundation's (NSF) Directorate for Computer and Information Science and Engineering (CISE) established the Expeditions in Computing (Expeditions) program to build on past successes and provide the CISE research and education community with the opportunity to pursue ambitious, fundamental research agendas that promise to define the future of computing and information.",
-                    "estimatedTotalProgramFunding": "60000000"  # $60,000,000 from screenshot
-                }
+# Hard-coded data for specific grants based on screenshots (read-only)
+MANUAL_GRANTS = MappingProxyType({
+    "324456": {  # Expeditions in Computing - UPDATED with correct values from screenshot
+        "detailsResponse": {
+            "opportunity": {
+                "awardCeiling": "5000000",  # $5,000,000 from screenshot
+                "awardFloor": "15000000",   # $15,000,000 from screenshot - this seems odd as floor > ceiling
+                "expectedNumOfAwards": "4",  # 4 from screenshot
+                "fundingInstrumentType": "Grant", # Grant from screenshot
+                "opportunityCategory": "Science and Technology and other Research and Development",
+                "description": "The far-reaching impact and role of innovating in the computer and information science and engineering fields has been remarkable, generating economic prosperity and enhancing the quality of life for people throughout the world. More than a decade ago, the National Science Foundation's (NSF) Directorate for Computer and Information Science and Engineering (CISE) established the Expeditions in Computing (Expeditions) program to build on past successes and provide the CISE research and education community with the opportunity to pursue ambitious, fundamental research agendas that promise to define the future of computing and information.",
+                "estimatedTotalProgramFunding": "60000000"  # $60,000,000 from screenshot
             }
-        },
-        "347494": {  # PAR-23-098
-            "detailsResponse": {
-                "opportunity": {
-                    "awardCeiling": "1500000",
-                    "awardFloor": "0",
-                    "expectedNumOfAwards": "0",
-                    "fundingInstrumentType": "Grant",
-                    "opportunityCategory": "Health",
-                    "description": "The Centers of Excellence in Genomic Science (CEGS) program establishes academic Centers for advanced genome research. Each CEGS award supports a multi-investigator, interdisciplinary team to develop integrated, transformative genomic approaches to address a biomedical problem.",
-                    "estimatedTotalProgramFunding": "0"
-                }
+        }
+    },
+    "347494": {  # PAR-23-098
+        "detailsResponse": {
+            "opportunity": {
+                "awardCeiling": "1500000",
+                "awardFloor": "0",
+                "expectedNumOfAwards": "0",
+                "fundingInstrumentType": "Grant",
+                "opportunityCategory": "Health",
+                "description": "The Centers of Excellence in Genomic Science (CEGS) program establishes academic Centers for advanced genome research. Each CEGS award supports a multi-investigator, interdisciplinary team to develop integrated, transformative genomic approaches to address a biomedical problem.",
+                "estimatedTotalProgramFunding": "0"
             }
-        },
-        "349473": {  # HHS-2024-ACL-AOD-DNSA-0022
-            "detailsResponse": {
-                "opportunity": {
-                    "awardCeiling": "375000",
-                    "awardFloor": "300000",
-                    "expectedNumOfAwards": "1",
-                    "fundingInstrumentType": "Cooperative Agreement",
-                    "opportunityCategory": "Income Security and Social Services",
-                    "description": "The projects will be funded under the Projects of National Significance (PNS) within the Developmental Disabilities Assistance and Bill of Rights Act. The projects will focus on protecting right and preventing abuse for individuals with intellectual and developmental disabilities.",
-                    "estimatedTotalProgramFunding": "1875000"
-                }
+        }
+    },
+    "349473": {  # HHS-2024-ACL-AOD-DNSA-0022
+        "detailsResponse": {
+            "opportunity": {
+                "awardCeiling": "375000",
+                "awardFloor": "300000",
+                "expectedNumOfAwards": "1",
+                "fundingInstrumentType": "Cooperative Agreement",
+                "opportunityCategory": "Income Security and Social Services",
+                "description": "The projects will be funded under the Projects of National Significance (PNS) within the Developmental Disabilities Assistance and Bill of Rights Act. The projects will focus on protecting right and preventing abuse for individuals with intellectual and developmental disabilities.",
+                "estimatedTotalProgramFunding": "1875000"
             }
         }
     }
-    
-    return grants.get(grant_id)
+})
+
+def manual_grant_data(grant_id):
+    """Hard-coded data for specific grants based on screenshots"""
+    return MANUAL_GRANTS.get(grant_id)
 
 def safe_float(value, default=0.0):
     """Convert value to float safely"""
@@ -140,9 +250,8 @@ def safe_float(value, default=0.0):
         return default
     try:
         if isinstance(value, str):
-            # Handle dollar sign and commas in currency
-            value = value.replace('$', '').replace(',', '')
-            value = re.sub(r'[^0-9\.\-]', '', value)
+            # Strip dollar signs, commas and anything else that isn't part of a number
+            value = NON_FLOAT_RE.sub('', value)
             if value == '' or value == '.' or value == '-' or value == '-.':
                 return default
         return float(value)
@@ -155,14 +264,16 @@ def extract_dollar_amount(text):
         return 0.0
     
     # Try to find dollar amount pattern like $1,500,000
-    match = re.search(r'\$\s*([\d,]+(?:\.\d+)?)', text)
+    match = DOLLAR_RE.search(text)
     if match:
         return safe_float(match.group(1))
     
     return 0.0
 
+@lru_cache(maxsize=1)
 def get_connection_string():
-    """Get Azure Storage connection string"""
+    """Get Azure Storage connection string. Cached for the life of the process, so the Azure CLI
+    fallback is spawned at most once"""
     connection_string = os.environ.get("STORAGE_CONNECTION")
     
     if not connection_string:
@@ -188,6 +299,13 @@ def get_connection_string():
     
     return connection_string
 
+@lru_cache(maxsize=1)
+def get_table_client():
+    """Shared GrantDetails table client, created on first use and reused by every grant"""
+    logger.info("Connecting to Azure Table Storage...")
+    table_service = TableServiceClient.from_connection_string(get_connection_string())
+    return table_service.get_table_client("GrantDetails")
+
 def rename_expected_awards(grant_id):
     """Function to rename ExpectedAwards to ExpectedNumberofAwards"""
     connection_string = get_connection_string()
@@ -196,15 +314,14 @@ def rename_expected_awards(grant_id):
         return False
         
     try:
-        table_service = TableServiceClient.from_connection_string(connection_string)
-        table_client = table_service.get_table_client("GrantDetails")
+        table_client = get_table_client()
         
         # Get the grant
         try:
-            entity = table_client.get_entity("Grant", grant_id)
+            entity = table_client.get_entity("Grant", grant_id, select=["ExpectedAwards", "ExpectedNumberofAwards"])
             
-            # Check if the old field exists and new field doesn't
-            if "ExpectedAwards" in entity and "ExpectedNumberofAwards" not in entity:
+            # Check if the old field exists and new field doesn't (a projected read returns missing ones as None)
+            if entity.get("ExpectedAwards") is not None and entity.get("ExpectedNumberofAwards") is None:
                 # Create update with new field
                 update_entity = {
                     "PartitionKey": "Grant",
@@ -226,6 +343,80 @@ def rename_expected_awards(grant_id):
         logger.error(f"Error in rename operation: {str(e)}")
         return False
 
+def update_entities(table_client, entities):
+    """Merge a batch of entities in one transaction, falling back to one call per entity.
+    Returns the number of entities updated."""
+    updated = 0
+    retry_individually = []
+    while entities:
+        try:
+            table_client.submit_transaction([("update", entity, {"mode": UpdateMode.MERGE}) for entity in entities])
+            updated += len(entities)
+            break
+        except TableTransactionError as e:
+            # The whole transaction was rolled back because of one operation (index 0 when the service
+            # doesn't say which) - set it aside for a single retry and resubmit the rest
+            index = e.index if e.index is not None and 0 <= e.index < len(entities) else 0
+            logger.warning(f"Batch update failed on grant {entities[index]['RowKey']}, resubmitting the rest: {str(e)}")
+            retry_individually.append(entities[index])
+            entities = entities[:index] + entities[index + 1:]
+        except Exception as e:
+            logger.warning(f"Batch update of {len(entities)} grants failed, retrying individually: {str(e)}")
+            retry_individually.extend(entities)
+            break
+    
+    for entity in retry_individually:
+        try:
+            table_client.update_entity(mode=UpdateMode.MERGE, entity=entity)
+            updated += 1
+        except Exception as e:
+            logger.error(f"Error updating grant {entity['RowKey']}: {str(e)}")
+    return updated
+
+def rename_expected_awards_bulk():
+    """Rename ExpectedAwards to ExpectedNumberofAwards for every grant in one scan,
+    merging the renames in transactions of TRANSACTION_BATCH_SIZE"""
+    if not get_connection_string():
+        logger.error("No connection string available")
+        return False
+    
+    renamed = 0
+    pending = 0
+    try:
+        table_client = get_table_client()
+        grants = table_client.query_entities(
+            "PartitionKey eq 'Grant'",
+            select=["RowKey", "ExpectedAwards", "ExpectedNumberofAwards"],
+            results_per_page=1000
+        )
+        
+        batch = []
+        for entity in grants:
+            # A projected read returns missing columns as None
+            if entity.get("ExpectedAwards") is None or entity.get("ExpectedNumberofAwards") is not None:
+                continue
+            
+            batch.append({
+                "PartitionKey": "Grant",
+                "RowKey": entity["RowKey"],
+                "ExpectedNumberofAwards": entity["ExpectedAwards"]
+            })
+            pending += 1
+            
+            if len(batch) == TRANSACTION_BATCH_SIZE:
+                renamed += update_entities(table_client, batch)
+                batch = []
+        
+        if batch:
+            renamed += update_entities(table_client, batch)
+        
+        logger.info(f"Renamed ExpectedAwards to ExpectedNumberofAwards for {renamed} of {pending} grants")
+        return renamed == pending
+        
+    except Exception as e:
+        logger.error(f"Error in bulk rename operation after renaming {renamed} grants: {str(e)}")
+        return False
+
 def verify_and_update_grant(grant_id):
     """Verify grant data against grants.gov and update if needed"""
     # Get connection string
@@ -236,14 +427,14 @@ def verify_and_update_grant(grant_id):
         
     # Connect to Azure Table
     try:
-        logger.info("Connecting to Azure Table Storage...")
-        table_service = TableServiceClient.from_connection_string(connection_string)
-        table_client = table_service.get_table_client("GrantDetails")
+        table_client = get_table_client()
         
         # Get the grant from Azure
         try:
-            azure_grant = table_client.get_entity("Grant", grant_id)
-            logger.info(f"Found grant {grant_id} in Azure Storage")
+            azure_grant = table_client.get_entity("Grant", grant_id, select=list(VERIFY_COLUMNS))
+            # Columns the grant doesn't have come back as None from a projected read
+            azure_grant = {column: value for column, value in azure_grant.items() if value is not None}
+            logger.info("Found grant %s in Azure Storage", grant_id)
         except Exception as e:
             logger.error(f"Grant {grant_id} not found in Azure Storage: {str(e)}")
             return False
@@ -253,7 +444,7 @@ def verify_and_update_grant(grant_id):
         
         # If not found in manual data, try to scrape from website
         if not grants_gov_data:
-            logger.info(f"No pre-defined data found for {grant_id}, trying to scrape from grants.gov...")
+            logger.info("No pre-defined data found for %s, trying to scrape from grants.gov...", grant_id)
             grants_gov_data = get_grant_from_grants_gov(grant_id)
         
         if not grants_gov_data:
@@ -281,62 +472,52 @@ def verify_and_update_grant(grant_id):
         description = opportunity.get("description", "")
         estimated_total = safe_float(opportunity.get("estimatedTotalProgramFunding", 0))
         
-        # Print current values found in the database
-        logger.info("--- Current values in Azure ---")
-        logger.info(f"Award Ceiling: ${azure_grant.get('AwardCeiling', 0):,.2f}")
-        logger.info(f"Award Floor: ${azure_grant.get('AwardFloor', 0):,.2f}")
-        logger.info(f"Expected Awards: {azure_grant.get('ExpectedAwards', 0)}")
-        logger.info(f"Category: {azure_grant.get('Category', '')}")
-        logger.info(f"Funding Type: {azure_grant.get('FundingType', '')}")
-        logger.info(f"Estimated Total Program Funding: ${azure_grant.get('EstimatedTotalProgramFunding', 0):,.2f}")
+        # Compare everything at once; steady-state grants return here without any per-field work
+        current = tuple(azure_grant.get(column, default) for column, default in VERIFY_COLUMNS.items())
+        new = (
+            award_ceiling if award_ceiling > 0 else current[0],
+            award_floor if award_floor > 0 else current[1],
+            expected_awards if expected_awards > 0 else current[2],
+            estimated_total if estimated_total > 0 else current[3],
+            funding_type or current[4],
+            category or current[5],
+            description or current[6],
+        )
+        if current == new:
+            logger.info("Grant %s already has accurate data - no update needed", grant_id)
+            return True
+        
+        # Print current values found in the database - the money formatting only runs when INFO is on
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("--- Current values in Azure ---")
+            logger.info(f"Award Ceiling: ${azure_grant.get('AwardCeiling', 0):,.2f}")
+            logger.info(f"Award Floor: ${azure_grant.get('AwardFloor', 0):,.2f}")
+            logger.info(f"Expected Awards: {azure_grant.get('ExpectedAwards', 0)}")
+            logger.info(f"Category: {azure_grant.get('Category', '')}")
+            logger.info(f"Funding Type: {azure_grant.get('FundingType', '')}")
+            logger.info(f"Estimated Total Program Funding: ${azure_grant.get('EstimatedTotalProgramFunding', 0):,.2f}")
         
-        # Create update entity
+        # Create update entity with just the columns that changed
         update_entity = {
             "PartitionKey": "Grant",
             "RowKey": grant_id,
             "DataTypesFixed": True
         }
+        update_entity.update(
+            (column, new_value)
+            for column, old_value, new_value in zip(VERIFY_COLUMNS, current, new)
+            if old_value != new_value
+        )
+        if "ExpectedAwards" in update_entity:
+            update_entity["ExpectedNumberofAwards"] = update_entity["ExpectedAwards"]  # Add new field name
         
-        # Flag to track if updates are needed
-        needs_update = False
+        # Update the entity
+        table_client.update_entity(mode=UpdateMode.MERGE, entity=update_entity)
         
-        # Check each field and update if needed
-        if azure_grant.get("AwardCeiling", 0) != award_ceiling and award_ceiling > 0:
-            update_entity["AwardCeiling"] = award_ceiling
-            needs_update = True
-            
-        if azure_grant.get("AwardFloor", 0) != award_floor and award_floor > 0:
-            update_entity["AwardFloor"] = award_floor
-            needs_update = True
-            
-        if azure_grant.get("ExpectedAwards", 0) != expected_awards and expected_awards > 0:
-            update_entity["ExpectedAwards"] = expected_awards
-            update_entity["ExpectedNumberofAwards"] = expected_awards  # Add new field name
-            needs_update = True
-            
-        if azure_grant.get("EstimatedTotalProgramFunding", 0) != estimated_total and estimated_total > 0:
-            update_entity["EstimatedTotalProgramFunding"] = estimated_total
-            needs_update = True
-            
-        if azure_grant.get("FundingType", "") != funding_type and funding_type:
-            update_entity["FundingType"] = funding_type
-            needs_update = True
-            
-        if azure_grant.get("Category", "") != category and category:
-            update_entity["Category"] = category
-            needs_update = True
-            
-        if description and azure_grant.get("Description", "") != description:
-            update_entity["Description"] = description
-            needs_update = True
-            
-        if needs_update:
-            # Update the entity
-            table_client.update_entity(mode=UpdateMode.MERGE, entity=update_entity)
-            
-            logger.info(f"Updated grant {grant_id} with accurate data")
-            
-            # Print comparison
+        logger.info("Updated grant %s with accurate data", grant_id)
+        
+        # Print comparison
+        if logger.isEnabledFor(logging.INFO):
             logger.info("--- Updated Values ---")
             if "AwardCeiling" in update_entity:
                 logger.info(f"Award Ceiling: OLD=${azure_grant.get('AwardCeiling', 0):,.2f}, NEW=${award_ceiling:,.2f}")
@@ -350,11 +531,8 @@ def verify_and_update_grant(grant_id):
                 logger.info(f"Category: OLD={azure_grant.get('Category', '')}, NEW={category}")
             if "FundingType" in update_entity:
                 logger.info(f"Funding Type: OLD={azure_grant.get('FundingType', '')}, NEW={funding_type}")
-            
-            return True
-        else:
-            logger.info(f"Grant {grant_id} already has accurate data - no update needed")
-            return True
+        
+        return True
             
     except Exception as e:
         logger.error(f"Error verifying grant {grant_id}: {str(e)}")
@@ -362,10 +540,39 @@ def verify_and_update_grant(grant_id):
         logger.error(traceback.format_exc())
         return False
 
-# For the specific grant in the screenshot
+def verify_grants(grant_ids):
+    """Verify several grants concurrently, then rename their award count field.
+    Returns the number of grants verified successfully."""
+    # Resolve the connection string and table client before the workers start, so they don't
+    # race to spawn the Azure CLI or build clients of their own
+    if not get_connection_string():
+        logger.error("No connection string available")
+        return 0
+    try:
+        get_table_client()
+    except Exception as e:
+        logger.error(f"Error connecting to Azure Table Storage: {str(e)}")
+        return 0
+    
+    verified = 0
+    with ThreadPoolExecutor(max_workers=VERIFY_WORKERS) as executor:
+        future_to_id = {executor.submit(verify_and_update_grant, grant_id): grant_id for grant_id in grant_ids}
+        for future in as_completed(future_to_id):
+            if future.result():
+                verified += 1
+            
+            # Rename the field for this grant
+            rename_expected_awards(future_to_id[future])
+    
+    logger.info(f"Verified {verified} of {len(grant_ids)} grants")
+    return verified
+
+# For the specific grant in the screenshot, or the grants given on the command line
 if __name__ == "__main__":
-    grant_id = "324456"  # Expeditions in Computing
-    verify_and_update_grant(grant_id)
+    # One-off migration of the old field name across the whole table
+    if "--rename-all" in sys.argv[1:]:
+        rename_expected_awards_bulk()
+        sys.exit(0)
     
-    # Rename the field for this grant
-    rename_expected_awards(grant_id)
\ No newline at end of file
+    grant_ids = list(dict.fromkeys(sys.argv[1:])) or ["324456"]  # Expeditions in Computing
+    verify_grants(grant_ids)
\ No newline at end of file
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts and Azure Functions are standalone modules rather than an installed package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src", "scripts"))
+sys.path.insert(0, os.path.join(ROOT, "functions"))
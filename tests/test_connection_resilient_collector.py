@@ -0,0 +1,82 @@
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def collector(tmp_path_factory):
+    # The collector opens grant_collection.log in the working directory on import
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("collector"))
+    try:
+        return importlib.import_module("connection_resilient_collector")
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def staging_conn(collector, monkeypatch, tmp_path):
+    monkeypatch.setattr(collector, "STAGING_DB", str(tmp_path / "grant_staging.db"))
+    conn = collector.open_staging_db()
+    yield conn
+    conn.close()
+
+
+class FakeTableClient:
+    def __init__(self, failing_row_keys=()):
+        self.failing_row_keys = set(failing_row_keys)
+        self.rows = {}
+        self.transactions = 0
+
+    def submit_transaction(self, operations):
+        self.transactions += 1
+        if any(entity["RowKey"] in self.failing_row_keys for _, entity in operations):
+            raise Exception("transaction failed")
+        for _, entity in operations:
+            self.rows[entity["RowKey"]] = entity
+
+    def upsert_entity(self, entity):
+        if entity["RowKey"] in self.failing_row_keys:
+            raise Exception("upsert failed")
+        self.rows[entity["RowKey"]] = entity
+
+
+def stage(collector, staging_conn, *row_keys):
+    for row_key in row_keys:
+        collector.stage_grant(staging_conn, {"PartitionKey": "Grant", "RowKey": row_key, "Title": f"Grant {row_key}"})
+
+
+def test_staged_grants_are_uploaded_one_transaction_per_batch(collector, staging_conn):
+    stage(collector, staging_conn, *(f"{i:03d}" for i in range(250)))
+    table_client = FakeTableClient()
+
+    assert collector.upload_staged_grants(staging_conn, table_client) == 250
+    assert table_client.transactions == 3
+    assert collector.get_staged_ids(staging_conn) == set()
+
+
+def test_failed_uploads_stay_staged_for_the_next_run(collector, staging_conn):
+    stage(collector, staging_conn, "1", "2", "3")
+    table_client = FakeTableClient(failing_row_keys={"2"})
+
+    assert collector.upload_staged_grants(staging_conn, table_client) == 2
+    assert set(table_client.rows) == {"1", "3"}
+    assert collector.get_staged_ids(staging_conn) == {"2"}
+
+    # A later run picks the leftover up
+    assert collector.upload_staged_grants(staging_conn, FakeTableClient()) == 1
+    assert collector.get_staged_ids(staging_conn) == set()
+
+
+def test_rows_marked_uploaded_by_older_runs_are_purged(collector, staging_conn):
+    stage(collector, staging_conn, "1", "2")
+    with staging_conn:
+        staging_conn.execute("UPDATE grants SET uploaded = 1 WHERE rowkey = '1'")
+    staging_conn.close()
+
+    reopened = collector.open_staging_db()
+    try:
+        assert [row[0] for row in reopened.execute("SELECT rowkey FROM grants")] == ["2"]
+    finally:
+        reopened.close()
@@ -0,0 +1,86 @@
+import io
+import json
+import logging
+
+import pytest
+
+pytest.importorskip("azure.functions")
+import ImportGrants
+
+
+class FakeInputStream(io.BufferedIOBase):
+    """Behaves like azure.functions.InputStream: the whole blob in memory, read() only"""
+
+    def __init__(self, data, name="grant-imports/test.ndjson"):
+        self._data = data
+        self.name = name
+
+    def read(self, size=-1):
+        data, self._data = self._data, b""
+        return data
+
+
+class FakeTableClient:
+    def __init__(self, fail_row_key=None):
+        self.fail_row_key = fail_row_key
+        self.rows = {}
+        self.transactions = 0
+        self.single_upserts = 0
+
+    def submit_transaction(self, operations):
+        self.transactions += 1
+        if any(entity["RowKey"] == self.fail_row_key for _, entity, _ in operations):
+            raise Exception("transaction failed")
+        for _, entity, _ in operations:
+            self.rows[entity["RowKey"]] = entity
+
+    def upsert_entity(self, entity, mode=None):
+        self.single_upserts += 1
+        if entity["RowKey"] == self.fail_row_key:
+            raise Exception("upsert failed")
+        self.rows[entity["RowKey"]] = entity
+
+
+def grant_line(row_key):
+    return json.dumps({"PartitionKey": "Grant", "RowKey": row_key, "AwardCeiling": 1000.0})
+
+
+def run_import(monkeypatch, content, table_client):
+    class FakeService:
+        def get_table_client(self, name):
+            assert name == "GrantDetails"
+            return table_client
+
+    monkeypatch.setattr(ImportGrants.TableServiceClient, "from_connection_string", lambda connection_string: FakeService())
+    ImportGrants.main(FakeInputStream(content.encode("utf-8")))
+
+
+def test_parse_entities_skips_blank_and_malformed_lines(caplog):
+    content = "\n".join([grant_line("1"), "", "{not json", grant_line("2")])
+
+    with caplog.at_level(logging.ERROR):
+        entities = list(ImportGrants.parse_entities(content, "test.ndjson"))
+
+    assert [entity["RowKey"] for entity in entities] == ["1", "2"]
+    assert "Skipping malformed line 3 in test.ndjson" in caplog.text
+
+
+def test_main_imports_in_transaction_sized_batches(monkeypatch):
+    table_client = FakeTableClient()
+    content = "\n".join(grant_line(str(i)) for i in range(250)) + "\n{broken\n"
+
+    run_import(monkeypatch, content, table_client)
+
+    assert len(table_client.rows) == 250
+    assert table_client.transactions == 3
+    assert table_client.single_upserts == 0
+
+
+def test_main_falls_back_to_single_upserts_when_a_batch_fails(monkeypatch):
+    table_client = FakeTableClient(fail_row_key="bad")
+    content = "\n".join([grant_line("1"), grant_line("bad"), grant_line("2")])
+
+    run_import(monkeypatch, content, table_client)
+
+    assert set(table_client.rows) == {"1", "2"}
+    assert table_client.single_upserts == 3
@@ -0,0 +1,67 @@
+import rate_limit
+from rate_limit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def install_clock(monkeypatch, clock):
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, "sleep", clock.sleep)
+
+
+def test_acquire_spaces_requests_at_the_configured_rate(monkeypatch):
+    clock = FakeClock()
+    install_clock(monkeypatch, clock)
+    bucket = TokenBucket(rate=4)
+
+    for _ in range(3):
+        bucket.acquire()
+
+    # The first request goes straight out, each later one waits a quarter second
+    assert clock.sleeps == [0.25, 0.25]
+
+
+def test_acquire_does_not_wait_after_an_idle_period(monkeypatch):
+    clock = FakeClock()
+    install_clock(monkeypatch, clock)
+    bucket = TokenBucket(rate=2)
+
+    bucket.acquire()
+    clock.now += 10
+    bucket.acquire()
+
+    assert clock.sleeps == []
+
+
+def test_pause_holds_back_the_next_request(monkeypatch):
+    clock = FakeClock()
+    install_clock(monkeypatch, clock)
+    bucket = TokenBucket(rate=10)
+
+    bucket.pause(5)
+    bucket.acquire()
+
+    assert clock.sleeps == [5]
+
+
+def test_pause_never_shortens_an_existing_wait(monkeypatch):
+    clock = FakeClock()
+    install_clock(monkeypatch, clock)
+    bucket = TokenBucket(rate=10)
+
+    bucket.pause(5)
+    bucket.pause(1)
+    bucket.acquire()
+
+    assert clock.sleeps == [5]
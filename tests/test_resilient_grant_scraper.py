@@ -0,0 +1,165 @@
+import importlib
+import os
+
+import lxml.html
+import pytest
+from azure.data.tables import TableTransactionError
+
+
+@pytest.fixture(scope="module")
+def scraper(tmp_path_factory):
+    # The scraper opens a timestamped log file in the working directory on import
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("scraper"))
+    try:
+        return importlib.import_module("resilient_grant_scraper")
+    finally:
+        os.chdir(cwd)
+
+
+AWARD_TABLE = (
+    "<table>"
+    "<tr><th>Award Floor</th><td>$10,000</td></tr>"
+    "<tr><th>Award Ceiling</th><td>$250,000</td></tr>"
+    "<tr><th>Expected Number of Awards</th><td>5</td></tr>"
+    "</table>"
+)
+
+
+def page_with_json(json_text):
+    return lxml.html.document_fromstring(
+        f'<html><body><script type="application/json">{json_text}</script>{AWARD_TABLE}</body></html>'
+    )
+
+
+class TestEnvSetting:
+    def test_missing_value_uses_the_default(self, scraper, monkeypatch):
+        monkeypatch.delenv("TEST_SETTING", raising=False)
+        assert scraper.env_setting("TEST_SETTING", 5, int, 1) == 5
+
+    def test_valid_value_is_used(self, scraper, monkeypatch):
+        monkeypatch.setenv("TEST_SETTING", "8")
+        assert scraper.env_setting("TEST_SETTING", 5, int, 1) == 8
+
+    @pytest.mark.parametrize("raw_value", ["abc", "", "2.5"])
+    def test_unparsable_value_falls_back_to_the_default(self, scraper, monkeypatch, caplog, raw_value):
+        monkeypatch.setenv("TEST_SETTING", raw_value)
+        assert scraper.env_setting("TEST_SETTING", 5, int, 1) == 5
+        assert "Invalid TEST_SETTING" in caplog.text
+
+    @pytest.mark.parametrize("raw_value", ["0", "-3"])
+    def test_value_below_the_minimum_is_clamped(self, scraper, monkeypatch, caplog, raw_value):
+        monkeypatch.setenv("TEST_SETTING", raw_value)
+        assert scraper.env_setting("TEST_SETTING", 5, int, 1) == 1
+        assert "below the minimum" in caplog.text
+
+    def test_nan_rate_is_clamped(self, scraper, monkeypatch):
+        monkeypatch.setenv("TEST_SETTING", "nan")
+        assert scraper.env_setting("TEST_SETTING", 2.0, float, 0.1) == 0.1
+
+
+class TestCircuitBreaker:
+    @pytest.fixture
+    def clock(self, scraper, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(scraper.time, "monotonic", lambda: now[0])
+        return now
+
+    def test_opens_after_the_failure_threshold(self, scraper, clock):
+        breaker = scraper.CircuitBreaker(failure_threshold=3, cooldown=60)
+        for _ in range(2):
+            breaker.record("url", False)
+        assert breaker.allow("url")
+
+        breaker.record("url", False)
+        assert not breaker.allow("url")
+        assert breaker.allow("other-url")
+
+    def test_success_resets_the_failure_count(self, scraper, clock):
+        breaker = scraper.CircuitBreaker(failure_threshold=2, cooldown=60)
+        breaker.record("url", False)
+        breaker.record("url", True)
+        breaker.record("url", False)
+        assert breaker.allow("url")
+
+    def test_half_open_probe_after_the_cooldown(self, scraper, clock):
+        breaker = scraper.CircuitBreaker(failure_threshold=1, cooldown=60)
+        breaker.record("url", False)
+        assert not breaker.allow("url")
+
+        clock[0] += 60
+        assert breaker.allow("url")
+        assert breaker.circuits["url"]["state"] == "HALF_OPEN"
+
+    def test_failed_probe_reopens_and_successful_probe_closes(self, scraper, clock):
+        breaker = scraper.CircuitBreaker(failure_threshold=1, cooldown=60)
+        breaker.record("url", False)
+        clock[0] += 60
+        assert breaker.allow("url")
+        breaker.record("url", False)
+        assert not breaker.allow("url")
+
+        clock[0] += 60
+        assert breaker.allow("url")
+        breaker.record("url", True)
+        assert breaker.circuits["url"]["state"] == "CLOSED"
+        assert breaker.allow("url")
+
+
+class TestExtractAll:
+    def test_table_values_override_partial_embedded_json(self, scraper):
+        data = scraper.extract_all(page_with_json('{"awardCeiling":500000}'))
+        assert data == {"awardCeiling": "250000", "awardFloor": "10000", "expectedNumOfAwards": "5"}
+
+    def test_unrelated_json_keys_do_not_hide_the_table(self, scraper):
+        data = scraper.extract_all(page_with_json('{"minimumCacheTTL":60}'))
+        assert data == {"awardCeiling": "250000", "awardFloor": "10000", "expectedNumOfAwards": "5"}
+
+    def test_complete_embedded_json_stops_early(self, scraper, monkeypatch):
+        monkeypatch.setattr(scraper, "extract_from_tables", lambda page: pytest.fail("tables should not be read"))
+        data = scraper.extract_all(page_with_json(
+            '{"awardCeiling":500000,"awardFloor":1000,"expectedNumOfAwards":3}'
+        ))
+        assert data["awardCeiling"] == 500000
+        assert set(scraper.REQUIRED_FIELDS) <= data.keys()
+
+
+class FakeTableClient:
+    def __init__(self, failing_row_keys=(), index=None):
+        self.failing_row_keys = set(failing_row_keys)
+        self.index = index
+        self.rows = {}
+        self.transactions = 0
+
+    def submit_transaction(self, operations):
+        self.transactions += 1
+        for position, (_, entity, _) in enumerate(operations):
+            if entity["RowKey"] in self.failing_row_keys:
+                index = position if self.index is None else self.index
+                raise TableTransactionError(message=f"{index}:The entity failed")
+        for _, entity, _ in operations:
+            self.rows[entity["RowKey"]] = entity
+
+    def update_entity(self, mode=None, entity=None):
+        if entity["RowKey"] in self.failing_row_keys:
+            raise Exception("update failed")
+        self.rows[entity["RowKey"]] = entity
+
+
+class TestUpdateEntities:
+    def test_whole_batch_in_one_transaction(self, scraper):
+        table_client = FakeTableClient()
+        assert scraper.update_entities(table_client, [{"RowKey": str(i)} for i in range(5)]) == 5
+        assert table_client.transactions == 1
+
+    def test_failing_operation_is_set_aside_and_the_rest_resubmitted(self, scraper):
+        table_client = FakeTableClient(failing_row_keys={"2"})
+        assert scraper.update_entities(table_client, [{"RowKey": str(i)} for i in range(5)]) == 4
+        assert set(table_client.rows) == {"0", "1", "3", "4"}
+        assert table_client.transactions == 2
+
+    def test_wrong_index_does_not_lose_good_entities(self, scraper):
+        # The SDK reports index 0 when the service doesn't name the failing operation
+        table_client = FakeTableClient(failing_row_keys={"3"}, index=0)
+        assert scraper.update_entities(table_client, [{"RowKey": str(i)} for i in range(5)]) == 4
+        assert set(table_client.rows) == {"0", "1", "2", "4"}
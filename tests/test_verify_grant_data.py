@@ -0,0 +1,176 @@
+import pytest
+
+import verify_grant_data
+
+
+GRANT_PAGE = (
+    b"<html><body><table>"
+    b"<tr><th>Award Ceiling:</th><td>$500,000</td></tr>"
+    b"<tr><th>Award Floor:</th><td>$10,000</td></tr>"
+    b"<tr><th>Expected Number of Awards:</th><td>4</td></tr>"
+    b"<tr><th>Funding Instrument Type:</th><td>Grant</td></tr>"
+    b"<tr><th>Category of Funding Activity:</th><td>Science</td></tr>"
+    b"<tr><th>Estimated Total Program Funding:</th><td>$2,000,000</td></tr>"
+    b"</table><div class=\"synopsis-detail\">Funds research.</div>"
+)
+
+
+class FakeResponse:
+    def __init__(self, chunks, status_code=200, headers=None):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.chunks_read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for chunk in self.chunks:
+            self.chunks_read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_read_grant_page_collects_labels_and_synopsis():
+    response = FakeResponse([GRANT_PAGE, b"</body></html>"])
+
+    rows, description = verify_grant_data.read_grant_page(response)
+
+    assert rows["Award Ceiling:"] == "$500,000"
+    assert rows["Expected Number of Awards:"] == "4"
+    assert description == "Funds research."
+    assert response.closed
+
+
+def test_read_grant_page_stops_once_everything_is_found():
+    response = FakeResponse([GRANT_PAGE, b"<p>" + b"x" * 100000 + b"</p>", b"</body></html>"])
+
+    verify_grant_data.read_grant_page(response)
+
+    assert response.chunks_read == 1
+    assert response.closed
+
+
+class TestGrantCache:
+    @pytest.fixture(autouse=True)
+    def cache_file(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(verify_grant_data, "GRANT_CACHE_FILE", str(tmp_path / "verify_grant_cache"))
+
+    def fetch_with(self, monkeypatch, page):
+        requests_made = []
+
+        def fake_get(url, headers=None, **kwargs):
+            requests_made.append(headers)
+            return FakeResponse([page], headers={"ETag": '"abc"'})
+
+        monkeypatch.setattr(verify_grant_data.SESSION, "get", fake_get)
+        return requests_made
+
+    def test_pages_with_data_are_cached(self, monkeypatch):
+        requests_made = self.fetch_with(monkeypatch, GRANT_PAGE + b"</body></html>")
+
+        first = verify_grant_data.get_grant_from_grants_gov("1")
+        second = verify_grant_data.get_grant_from_grants_gov("1")
+
+        assert first == second
+        assert first["detailsResponse"]["opportunity"]["awardCeiling"] == "$500,000"
+        assert len(requests_made) == 1
+
+    def test_pages_without_data_are_not_cached(self, monkeypatch):
+        requests_made = self.fetch_with(monkeypatch, b"<html><body>Maintenance</body></html>")
+
+        verify_grant_data.get_grant_from_grants_gov("1")
+        verify_grant_data.get_grant_from_grants_gov("1")
+
+        assert len(requests_made) == 2
+        assert verify_grant_data.get_cached_grant("1") is None
+
+
+class FakeTableClient:
+    def __init__(self, entity):
+        self.entity = entity
+        self.updates = []
+
+    def get_entity(self, partition_key, row_key, select=None):
+        return {column: self.entity.get(column) for column in select}
+
+    def update_entity(self, mode=None, entity=None):
+        self.updates.append(entity)
+
+
+class TestVerifyAndUpdateGrant:
+    OPPORTUNITY = {
+        "awardCeiling": "$500,000",
+        "awardFloor": "$10,000",
+        "expectedNumOfAwards": "4",
+        "estimatedTotalProgramFunding": "$2,000,000",
+        "fundingInstrumentType": "Grant",
+        "opportunityCategory": "Science",
+        "description": "Funds research.",
+    }
+    STORED = {
+        "AwardCeiling": 500000.0,
+        "AwardFloor": 10000.0,
+        "ExpectedAwards": 4,
+        "EstimatedTotalProgramFunding": 2000000.0,
+        "FundingType": "Grant",
+        "Category": "Science",
+        "Description": "Funds research.",
+    }
+
+    def run(self, monkeypatch, stored):
+        table_client = FakeTableClient(stored)
+        monkeypatch.setattr(verify_grant_data, "get_connection_string", lambda: "connection")
+        monkeypatch.setattr(verify_grant_data, "get_table_client", lambda: table_client)
+        monkeypatch.setattr(verify_grant_data, "manual_grant_data", lambda grant_id: None)
+        monkeypatch.setattr(
+            verify_grant_data, "get_grant_from_grants_gov",
+            lambda grant_id: {"detailsResponse": {"opportunity": dict(self.OPPORTUNITY)}}
+        )
+        assert verify_grant_data.verify_and_update_grant("1")
+        return table_client.updates
+
+    def test_matching_grant_is_not_updated(self, monkeypatch):
+        assert self.run(monkeypatch, dict(self.STORED)) == []
+
+    def test_only_changed_columns_are_written(self, monkeypatch):
+        stored = dict(self.STORED, AwardCeiling=0.0, ExpectedAwards=1)
+
+        updates = self.run(monkeypatch, stored)
+
+        assert updates == [{
+            "PartitionKey": "Grant",
+            "RowKey": "1",
+            "DataTypesFixed": True,
+            "AwardCeiling": 500000.0,
+            "ExpectedAwards": 4,
+            "ExpectedNumberofAwards": 4,
+        }]
+
+
+class FailingTransactionClient:
+    def __init__(self, failing_row_keys):
+        self.failing_row_keys = failing_row_keys
+        self.rows = {}
+
+    def submit_transaction(self, operations):
+        for position, (_, entity, _) in enumerate(operations):
+            if entity["RowKey"] in self.failing_row_keys:
+                raise verify_grant_data.TableTransactionError(message=f"{position}:The entity failed")
+        for _, entity, _ in operations:
+            self.rows[entity["RowKey"]] = entity
+
+    def update_entity(self, mode=None, entity=None):
+        if entity["RowKey"] in self.failing_row_keys:
+            raise Exception("update failed")
+        self.rows[entity["RowKey"]] = entity
+
+
+def test_update_entities_skips_only_the_failing_operation():
+    table_client = FailingTransactionClient({"2"})
+
+    updated = verify_grant_data.update_entities(table_client, [{"RowKey": str(i)} for i in range(5)])
+
+    assert updated == 4
+    assert set(table_client.rows) == {"0", "1", "3", "4"}